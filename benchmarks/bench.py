@@ -0,0 +1,186 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(os.path.dirname(BENCHMARKS), "source")
+BASELINE = os.path.join(BENCHMARKS, "baseline.json")
+sys.path.insert(0, SOURCE)
+
+
+def percentiles(samples, points=(50, 90, 99)) -> dict:
+    ordered = sorted(samples)
+    result = {f"p{point}": ordered[min(len(ordered) - 1, len(ordered) * point // 100)] for point in points}
+    result["min"] = ordered[0]
+    result["mean"] = sum(ordered) / len(ordered)
+    return {key: round(value, 3) for key, value in result.items()}
+
+
+def measure(setup, number, repeat) -> dict:
+    runner = setup()
+    prepare, run = runner if isinstance(runner, tuple) else (None, runner)
+
+    def sample() -> float:
+        if prepare is not None:
+            prepare()
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        return (time.perf_counter() - start) / number * 1e6
+
+    for _ in range(max(1, repeat // 20)):
+        sample()
+
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        times = [sample() for _ in range(repeat)]
+    finally:
+        if enabled:
+            gc.enable()
+
+    # one more sample under tracemalloc, which slows it down too much to time
+    if prepare is not None:
+        prepare()
+    tracemalloc.start()
+    for _ in range(number):
+        run()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {"unit": "us", "number": number, "repeat": repeat}
+    result.update(percentiles(times))
+    result["alloc_peak"] = peak // number
+    result["alloc_kept"] = current // number
+    return result
+
+
+def compare(results, baseline, tolerance) -> list:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None or "p50" not in result or "p50" not in base:
+            continue
+        result["baseline_p50"] = base["p50"]
+        result["ratio"] = round(result["p50"] / base["p50"], 3) if base["p50"] else None
+        if result["ratio"] is not None and result["ratio"] > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def allocations(setup, number, rounds=5) -> float:
+    # bytes a call keeps: after a warm-up round, the smallest growth over several rounds of number
+    # calls, each measured between full collections, less what measuring an empty round costs.
+    # One-off growth (a dict resizing, a game's stack changing shape) shows in some rounds only;
+    # memory kept by every call shows in all of them.
+    runner = setup()
+    prepare, run = runner if isinstance(runner, tuple) else (None, runner)
+    if prepare is not None:
+        prepare()
+    for _ in range(number):
+        run()
+
+    growth = []
+    tracemalloc.start()
+    try:
+        for calls in [0] + [number] * rounds:
+            gc.collect()
+            before = tracemalloc.get_traced_memory()[0]
+            for _ in range(calls):
+                run()
+            gc.collect()
+            growth.append(tracemalloc.get_traced_memory()[0] - before)
+    finally:
+        tracemalloc.stop()
+    return max(0, min(growth[1:]) - growth[0]) / number
+
+
+def check_allocations(cases, pattern) -> int:
+    # the cases registered with kept=N fail when their calls keep a whole byte each beyond N, which
+    # any object left behind by every call does; no timing involved
+    failures = 0
+    for name, (setup, number, repeat, kept) in cases.items():
+        if kept is None or pattern not in name:
+            continue
+        try:
+            per_call = allocations(setup, number)
+        except Exception as reason:
+            print(f"{name:<32} skipped: {reason}", file=sys.stderr)
+            continue
+        ok = per_call < kept + 1
+        failures += not ok
+        print(f"{name:<32} {'ok' if ok else 'FAIL'}  keeps {per_call:.2f}B a call, limit {kept}B", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the engine's hot paths headless.")
+    parser.add_argument("-k", "--filter", default="", help="only cases whose name contains this")
+    parser.add_argument("--scale", type=float, default=1, help="multiplies every case's sample count")
+    parser.add_argument("--output", default=None, help="write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="p50 ratio over baseline that fails")
+    parser.add_argument("--allocations", action="store_true",
+                        help="only check the cases' allocation limits, without timing anything")
+    args = parser.parse_args(argv)
+
+    import pygame
+    from cases import CASES, Skip
+
+    if args.allocations:
+        return check_allocations(CASES, args.filter)
+
+    results = {}
+    for name, (setup, number, repeat, kept) in CASES.items():
+        if args.filter not in name:
+            continue
+        try:
+            results[name] = measure(setup, number, max(1, int(repeat * args.scale)))
+        except Skip as reason:
+            results[name] = {"skipped": str(reason)}
+        result = results[name]
+        line = result.get("skipped") or "p50 {p50:>10.2f}us  p99 {p99:>10.2f}us  peak {alloc_peak}B".format(**result)
+        print(f"{name:<32} {line}", file=sys.stderr)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+        "regressions": regressions,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+    if args.save:
+        with open(args.baseline, "w") as file:
+            file.write(text)
+    for name in regressions:
+        print(f"regression: {name} p50 is {results[name]['ratio']}x the baseline", file=sys.stderr)
+    return 1 if regressions and not args.save else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+import os
+import random
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from bitboard import BitBoard
+from config import DIM, FIGURE_NAMES
+from rules import Board, Game
+from tournament import random_agent
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "source")
+BOARDS = {"Board": Board, "BitBoard": BitBoard}
+
+CASES = {}
+
+
+class Skip(Exception):
+    pass
+
+
+def case(name, number=1, repeat=200, kept=None):
+    # registers a setup function; it returns run, or (prepare, run) when every sample needs fresh
+    # state: prepare is called before each sample and left out of the timing. With kept, a call
+    # that keeps more than that many bytes fails bench.py --allocations.
+    def register(setup):
+        CASES[name] = setup, number, repeat, kept
+        return setup
+    return register
+
+
+def stacked(board, seed=0, height=8, full=()) -> Game:
+    # a game with a ragged stack: one hole per row, except the rows listed in full
+    game = Game(seed, board)
+    field, rng = game.field, random.Random(seed)
+    for y in range(field.rows - height, field.rows):
+        hole = rng.randrange(field.cols)
+        for x in range(field.cols):
+            if x != hole or y in full:
+                field[x, y] = rng.choice(FIGURE_NAMES)
+    return game
+
+
+for _name, _board in BOARDS.items():
+
+    @case(f"collide_figure[{_name}]", number=1000)
+    def collide_figure(board=_board):
+        return stacked(board).field.collide_figure
+
+    @case(f"height[{_name}]", number=200)
+    def height(board=_board):
+        return stacked(board).field.height
+
+    @case(f"rotate_figure[{_name}]", number=200)
+    def rotate_figure(board=_board):
+        # an I standing against the left wall, so turning it flat needs a kick
+        field = stacked(board, 1).field
+        field.figure.reset("I")
+        figure = field.figure
+
+        def run():
+            figure.orient, figure.pos[0], figure.pos[1] = 1, 0, 4
+            field.rotate_figure(1)
+        return run
+
+    @case(f"full_rows[{_name}]", number=200)
+    def full_rows(board=_board):
+        return stacked(board, full=(13, 15, 17, 19)).field.full_rows
+
+    @case(f"clear_lines[{_name}]", repeat=100)
+    def clear_lines(board=_board):
+        game = None
+
+        def prepare():
+            nonlocal game
+            game = stacked(board, full=(13, 15, 17, 19))
+
+        def run():
+            game.clear_lines()
+        return prepare, run
+
+    @case(f"random_game[{_name}]", repeat=20)
+    def random_game(board=_board):
+        game = None
+
+        def prepare():
+            nonlocal game
+            game = Game(0, board)
+
+        def run():
+            while not game.over:
+                game.place(*random_agent(game))
+        return prepare, run
+
+
+@case("bot.choose", number=10, repeat=50)
+def bot_choose():
+    from bot import Bot
+
+    game, bot = stacked(BitBoard, height=6), Bot(capacity=0)
+    return lambda: bot(game)
+
+
+@case("Match.step[steady]", number=600, repeat=20, kept=0)
+def match_step():
+    # a served game left alone: gravity, sweeps and settling on the fixed-step clock
+    from server import Match
+
+    match = Match(0)
+    for _ in range(600):
+        match.step()
+    return match.step
+
+
+def display():
+    import pygame
+
+    pygame.display.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode(DIM["screen"])
+    return pygame
+
+
+def field():
+    # a bare host for the field: the switches it reads and a Graphics of its own
+    from classes import Field
+    from graphics import Graphics
+
+    host = SimpleNamespace(theme_switch=SimpleNamespace(state=False), shadow_switch=SimpleNamespace(state=True))
+    host.graphics = Graphics(host)
+    field = Field(host, DIM["field"], "T")
+    game = stacked(Board, height=10)
+    for x, y, tile in game.field:
+        if tile:
+            field[x, y] = tile
+    field.figure.pos[1] = 3
+    return field
+
+
+@case("Field.render", number=10)
+def field_render():
+    pygame = display()
+    surface, instance = pygame.Surface(DIM["screen"]), field()
+    return lambda: instance.render(surface)
+
+
+@case("Field.render[theme]", number=10)
+def field_render_theme():
+    # the whole stack redrawn from the atlas, as after a theme switch
+    pygame = display()
+    surface, instance = pygame.Surface(DIM["screen"]), field()
+
+    def run():
+        instance.stack_theme = None
+        instance.render(surface)
+    return run
+
+
+@case("EventHandler.update[idle]", number=600, repeat=20, kept=0)
+def event_handler_update():
+    display()
+    from clock import Clock
+    from events import EventHandler
+    from settings import keys
+
+    clock = Clock(60)
+    handler = EventHandler(clock, keys())
+
+    def run():
+        clock.step()
+        handler.update()
+    return run
+
+
+def engine():
+    display()
+    try:
+        from engine import Engine
+        Engine.recording = False
+        instance = Engine()
+    except Exception as error:
+        raise Skip(f"Engine cannot start here: {error!r}")
+    instance.running[1] = False
+    return instance
+
+
+STARTUP = """
+import sys
+sys.path.insert(0, {source!r})
+from engine import Engine
+Engine.recording = False
+engine = Engine()
+engine.running[1] = False
+engine.render()
+"""
+
+
+@case("startup", repeat=10)
+def startup():
+    # time to first frame of a fresh interpreter: imports, window, assets and the first render
+    command = [sys.executable, "-c", STARTUP.format(source=SOURCE)]
+
+    def run():
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return run
+
+
+@case("Engine.render[full]", number=10)
+def engine_render_full():
+    instance = engine()
+
+    def run():
+        instance.layers = {}
+        instance.render()
+    return run
+
+
+@case("Engine.render[piece moved]", number=100)
+def engine_render_piece():
+    instance = engine()
+    instance.render()
+    figure = instance.field.figure
+
+    def run():
+        figure.pos[1] = 4 - figure.pos[1]
+        instance.render()
+    return run
+
+
+@case("Engine.frame[steady]", number=600, repeat=20, kept=0)
+def engine_frame():
+    # one pass of Engine.loop without input or sleeping: the figure falls, nothing else changes
+    instance = engine()
+
+    def run():
+        instance.clock.step()
+        instance.events()
+        instance.logic()
+        instance.render()
+    for _ in range(600):
+        run()
+    return run
@@ -0,0 +1,35 @@
+import hashlib
+import os
+
+from config import PATH, ASSET_CACHE
+
+# preprocessed assets on disk, e.g. sounds already decoded to the mixer's format. An entry is
+# named by a hash of everything its bytes depend on, so a changed source file or setting simply
+# misses; the folder can be deleted at any time.
+
+
+def entry(kind, parts) -> str:
+    return os.path.join(PATH["cache"], kind, hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+def load(kind, *parts):
+    if not ASSET_CACHE:
+        return None
+    try:
+        with open(entry(kind, parts), 'rb') as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def store(kind, data, *parts):
+    if not ASSET_CACHE:
+        return
+    path = entry(kind, parts)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", 'wb') as file:
+            file.write(data)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass  # a read-only install just goes without
@@ -2,40 +2,90 @@ import os
 from functools import wraps
 
 import pygame
+import assets
 from settings import SOUND_DATA, PATH
 
-pygame.mixer.init()
-
 
 class Sound(pygame.mixer.Sound):
 
     def __init__(self, filename, volume=0.1):
-        super().__init__(os.path.join(PATH["audio"], filename))
+        path = os.path.join(PATH["audio"], filename)
+        stat = os.stat(path)
+        parts = filename, stat.st_size, stat.st_mtime_ns, pygame.mixer.get_init()
+        raw = assets.load("sounds", *parts)
+        if raw is None:
+            super().__init__(path)
+            assets.store("sounds", self.get_raw(), *parts)
+        else:
+            super().__init__(buffer=raw)
         self.set_volume(volume)
 
 
 class Mixer:
+    # nothing happens on import: init() starts the mixer, a sound is decoded the first time it
+    # plays and the theme music is loaded the first time it is turned on
 
-    SOUNDS = {name: Sound(filename) for name, filename in SOUND_DATA.items()}
+    SOUNDS = {}
     theme = pygame.mixer.music
-    theme.load(os.path.join(PATH["audio"], SOUND_DATA["theme"]))
+    theme_loaded = False
     enabled = False
+    ready = False
+    volume = 0.1
+
+    @classmethod
+    def init(cls):
+        try:
+            pygame.mixer.init()
+            cls.ready = True
+        except pygame.error:
+            cls.ready = False  # no audio device: the game runs silent
+
+    @classmethod
+    def sound(cls, key) -> Sound:
+        sound = cls.SOUNDS.get(key)
+        if sound is None:
+            sound = cls.SOUNDS[key] = Sound(SOUND_DATA[key], cls.volume)
+        return sound
+
+    @classmethod
+    def effect(cls, key):
+        if cls.enabled and cls.ready:
+            cls.sound(key).play()
+
+    @classmethod
+    def play_theme(cls):
+        if not cls.ready:
+            return
+        if not cls.theme_loaded:
+            cls.theme.load(os.path.join(PATH["audio"], SOUND_DATA["theme"]))
+            cls.theme.set_volume(cls.volume)
+            cls.theme_loaded = True
+        cls.theme.play(-1)
+
+    @classmethod
+    def stop_theme(cls):
+        if cls.theme_loaded:
+            cls.theme.stop()
 
     @classmethod
-    def play(cls, key):
-        sound = cls.SOUNDS[key]
+    def play(cls, key, on_success=False):
 
         def outer_wrapper(function):
             @wraps(function)
             def inner_wrapper(self, *args, **kwargs):
-                if cls.enabled:
-                    sound.play()
-                return function(self, *args, **kwargs)
+                if not on_success:
+                    cls.effect(key)
+                result = function(self, *args, **kwargs)
+                if on_success and result:
+                    cls.effect(key)
+                return result
             return inner_wrapper
         return outer_wrapper
 
     @classmethod
-    def set_volume(cls, value, sounds=SOUNDS.keys()):
-        cls.theme.set_volume(value)
-        for key in sounds:
-            cls.SOUNDS[key].set_volume(value)
+    def set_volume(cls, value):
+        cls.volume = value
+        if cls.theme_loaded:
+            cls.theme.set_volume(value)
+        for sound in cls.SOUNDS.values():
+            sound.set_volume(value)
@@ -0,0 +1,118 @@
+import numpy as np
+
+from config import FIELD, SCORE, STARTING_LEVEL, MAX_LEVEL
+from rules import SHAPES
+
+NAMES = tuple(SHAPES)
+
+# orientations are padded to 4 by wrapping, so any orient index is valid for every figure
+ORIENTS = np.array([len(SHAPES[name]) for name in NAMES], np.int64)
+CELLS = np.array([[SHAPES[name][o % len(SHAPES[name])].cells for o in range(4)] for name in NAMES], np.int64)
+LEFT = CELLS[..., 0].min(-1)
+RIGHT = CELLS[..., 0].max(-1)
+POINTS = np.array(SCORE, np.int64)
+
+
+def splitmix64(x):
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+class Batch:
+    # N independent games advanced in lockstep, one placement per game per step;
+    # cells hold 0 for empty or 1 + the index of the figure in NAMES
+
+    def __init__(self, seeds, cols=FIELD[0], rows=FIELD[1]):
+        self.n = len(seeds)
+        self.cols = cols
+        self.rows = rows
+        self.index = np.arange(self.n)
+        self.row_index = np.arange(rows)
+
+        self.fields = np.zeros((self.n, rows, cols), np.uint8)
+        self.seeds = splitmix64(np.asarray(seeds, np.uint64))
+        self.draws = np.zeros(self.n, np.uint64)
+        self.bag = np.ones((self.n, len(NAMES)), bool)
+
+        self.over = np.zeros(self.n, bool)
+        self.pieces = np.zeros(self.n, np.int64)
+        self.lines = np.zeros(self.n, np.int64)
+        self.score = np.zeros(self.n, np.int64)
+        self.level = np.full(self.n, min(STARTING_LEVEL, MAX_LEVEL), np.int64)
+
+        self.figure = self.next(self.index)
+        self.next_figure = self.next(self.index)
+
+    def next(self, games):
+        # vectorised 7-bag: a counter-based hash of (seed, draw) picks one of the figures left in the bag
+        bag = self.bag[games]
+        left = bag.sum(1)
+        pick = (splitmix64(self.seeds[games] ^ self.draws[games]) % left.astype(np.uint64)).astype(np.int64)
+        figure = (bag.cumsum(1) > pick[:, None]).argmax(1)
+
+        bag[np.arange(len(games)), figure] = False
+        bag[~bag.any(1)] = True
+        self.bag[games] = bag
+        self.draws[games] += np.uint64(1)
+        return figure
+
+    def collide(self, games, figure, orient, x, y):
+        cx = x[:, None] + CELLS[figure, orient, :, 0]
+        cy = y[:, None] + CELLS[figure, orient, :, 1]
+        inside = (cx >= 0).all(1) & (cx < self.cols).all(1) & (cy < self.rows).all(1)
+        hit = np.ones(len(games), bool)
+        ok = games[inside]
+        hit[inside] = self.fields[ok[:, None], cy[inside], cx[inside]].any(1)
+        return hit
+
+    def place(self, x, orient):
+        # rotate and shift the current figure at spawn height, then hard drop it (same as Field.place_figure)
+        games = self.index[~self.over]
+        figure = self.figure[games]
+        orient = np.asarray(orient)[games] % ORIENTS[figure]
+        x = np.clip(np.asarray(x)[games], -LEFT[figure, orient], self.cols - 1 - RIGHT[figure, orient])
+        y = (orient != 0).astype(np.int64)
+
+        blocked = self.collide(games, figure, orient, x, y)
+        self.over[games[blocked]] = True
+        games, figure, orient, x, y = games[~blocked], figure[~blocked], orient[~blocked], x[~blocked], y[~blocked]
+
+        cx = x[:, None] + CELLS[figure, orient, :, 0]
+        cy = y[:, None] + CELLS[figure, orient, :, 1]
+        below = self.fields[games[:, None], :, cx].astype(bool) & (self.row_index >= cy[..., None])
+        first = np.where(below.any(-1), below.argmax(-1), self.rows)
+        cy += (first - cy).min(1, keepdims=True) - 1
+        self.fields[games[:, None], cy, cx] = figure[:, None] + 1
+        self.pieces[games] += 1
+
+        self.clear(games)
+        self.spawn(games)
+
+    def clear(self, games):
+        full = self.fields[games].all(2)
+        count = full.sum(1)
+        games, full, count = games[count > 0], full[count > 0], count[count > 0]
+        if len(games):
+            # every kept row falls by the number of full rows below it
+            shift = full[:, ::-1].cumsum(1)[:, ::-1] - full
+            game, row = np.nonzero(~full)
+            compact = np.zeros((len(games), self.rows, self.cols), np.uint8)
+            compact[game, row + shift[game, row]] = self.fields[games[game], row]
+            self.fields[games] = compact
+
+            self.lines[games] += count
+            self.level[games] = np.minimum(self.lines[games] // 10 + STARTING_LEVEL, MAX_LEVEL)
+            self.score[games] += POINTS[count] * self.level[games]
+
+    def spawn(self, games):
+        self.over[games[self.fields[games, 0].any(1)]] = True
+        games = games[~self.over[games]]
+
+        self.figure[games] = self.next_figure[games]
+        self.next_figure[games] = self.next(games)
+        spawn = np.full(len(games), 5)
+        blocked = self.collide(games, self.figure[games], np.zeros(len(games), np.int64), spawn, np.zeros_like(spawn))
+        self.over[games[blocked]] = True
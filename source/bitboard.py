@@ -0,0 +1,84 @@
+from rules import Board, SHAPES
+
+
+def compile_masks(orientation):
+    rows = {}
+    for x, y in orientation.cells:
+        rows[y] = rows.get(y, 0) | 1 << (x - orientation.left)
+    return orientation.left, orientation.right, tuple(sorted(rows.items()))
+
+
+# shape -> orient -> (left, right, ((dy, row mask shifted to the left edge), ...))
+MASKS = {shape: tuple(compile_masks(orientation) for orientation in table) for shape, table in SHAPES.items()}
+
+
+class BitBoard(Board):
+    # rows are mirrored as integer bitmasks (bit x = column x); self.data stays the colour view
+
+    def __init__(self, engine, dim, _next):
+        Board.__init__(self, engine, dim, _next)
+        self.masks = [0] * self.rows
+        self.full = (1 << self.cols) - 1
+
+    def __setitem__(self, index, item):
+        x, y = int(index[0]), int(index[1])
+        if item:
+            self.masks[y] |= 1 << x
+        else:
+            self.masks[y] &= ~(1 << x)
+        Board.__setitem__(self, index, item)
+
+    def set_row(self, row, item):
+        Board.set_row(self, row, item)
+        self.masks[row] = self.full if item else 0
+
+    def del_row(self, row):
+        Board.del_row(self, row)
+        del self.masks[row]
+        self.masks.insert(0, 0)
+
+    def collide(self, figure, orient, x, y) -> bool:
+        left, right, rows = MASKS[figure][orient]
+        if x + left < 0 or x + right >= self.cols:
+            return True
+        x += left
+        masks, height = self.masks, self.rows
+        for dy, bits in rows:
+            if y + dy >= height or masks[y + dy] & bits << x:
+                return True
+        return False
+
+    def collide_figure(self, sides=True, pos=0):
+        x, y = self.figure.pos
+        left, right, rows = MASKS[self.figure.figure][self.figure.orient]
+        if sides and x + left < 0:
+            return 2
+        if sides and x + right >= self.cols:
+            return 3
+        x, y = x + left, y + pos
+        masks, height = self.masks, self.rows
+        for dy, bits in rows:
+            if y + dy >= height or masks[y + dy] & bits << x:
+                return 1
+        return 0
+
+    def merge_figure(self):
+        x, y = self.figure.pos
+        left, right, rows = MASKS[self.figure.figure][self.figure.orient]
+        for dy, bits in rows:
+            self.masks[y + dy] |= bits << x + left
+        Board.merge_figure(self)
+
+    def full_rows(self):
+        return [i for i, mask in enumerate(self.masks) if mask == self.full]
+
+    def probe(self, distance=0):
+        x, y = self.figure.pos
+        left, right, rows = MASKS[self.figure.figure][self.figure.orient]
+        x += left
+        masks, height = self.masks, self.rows
+        while True:
+            for dy, bits in rows:
+                if y + dy + distance >= height or masks[y + dy + distance] & bits << x:
+                    return distance - 1
+            distance += 1
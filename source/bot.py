@@ -0,0 +1,209 @@
+from collections import OrderedDict
+
+from bitboard import MASKS
+from config import FIELD
+from rules import SHAPES, ZOBRIST
+
+COLS, ROWS = FIELD
+FULL = (1 << COLS) - 1
+WEIGHTS = (-0.510066, 0.760666, -0.35663, -0.184483)  # aggregate height, lines, holes, bumpiness
+BEAM = 4
+TABLE_SIZE = 4096  # expansions kept in a bot's transposition table, a few KB each
+
+
+def compile_piece(orientation, masks):
+    # per column of the figure: (dx, lowest dy, highest dy); rows as in bitboard.MASKS
+    columns = {}
+    for dx, dy in orientation.cells:
+        low, high = columns.get(dx, (dy, dy))
+        columns[dx] = max(low, dy), min(high, dy)
+    left, right, rows = masks
+    return left, right, tuple((dx, low, high) for dx, (low, high) in sorted(columns.items())), rows
+
+
+def compile_pieces(shape) -> tuple:
+    # ((orient, piece), ...) leaving out orientations with the same cells as an earlier one
+    pieces, seen = [], set()
+    for orient, orientation in enumerate(SHAPES[shape]):
+        cells = frozenset(orientation.cells)
+        if cells not in seen:
+            seen.add(cells)
+            pieces.append((orient, compile_piece(orientation, MASKS[shape][orient])))
+    return tuple(pieces)
+
+
+PIECES = {shape: compile_pieces(shape) for shape in SHAPES}
+
+
+def row_keys(keys) -> list:
+    # row mask -> xor of the Zobrist keys of its cells, so a search state updates its key a row at a time
+    table = [0] * (1 << len(keys))
+    for mask in range(1, len(table)):
+        low = mask & -mask
+        table[mask] = table[mask ^ low] ^ keys[low.bit_length() - 1]
+    return table
+
+
+ROW_KEYS = [row_keys(keys) for keys in ZOBRIST]
+
+
+def bumpiness(heights) -> int:
+    return sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+
+
+def survey(masks) -> tuple:
+    # (masks, heights, holes, aggregate height, bumpiness, Zobrist key) of a stack of row masks, top row first
+    heights, holes, covered, key = [0] * COLS, 0, 0, 0
+    for y, mask in enumerate(masks):
+        key ^= ROW_KEYS[y][mask]
+        holes += bin(covered & ~mask).count("1")
+        new = mask & ~covered
+        while new:
+            bit = new & -new
+            heights[bit.bit_length() - 1] = ROWS - y
+            new ^= bit
+        covered |= mask
+    return tuple(masks), tuple(heights), holes, sum(heights), bumpiness(heights), key
+
+
+def snapshot(board) -> tuple:
+    masks = getattr(board, "masks", None)
+    if masks is None:
+        masks = [sum(1 << x for x, cell in enumerate(row) if cell) for row in board.data]
+    if FULL in masks:
+        # rows already marked for a deferred clear are as good as gone
+        kept = [mask for mask in masks if mask != FULL]
+        return survey([0] * (len(masks) - len(kept)) + kept)
+    return tuple(masks), tuple(board.tops), board.holes, sum(board.tops), bumpiness(board.tops), board.zobrist
+
+
+def drop(state, piece, x):
+    # hard drops a piece straight down at x; the new state and the lines it clears, or None if it
+    # does not fit under the ceiling. Without a clear only the columns under the piece and the
+    # bumpiness of their edges are updated.
+    masks, heights, holes, total, bump, key = state
+    left, right, columns, rows = piece
+    y = ROWS
+    for dx, low, high in columns:
+        if ROWS - heights[x + dx] - 1 - low < y:
+            y = ROWS - heights[x + dx] - 1 - low
+    if y + rows[0][0] < 0:
+        return None
+
+    masks = list(masks)
+    shift = x + left
+    full = 0
+    for dy, bits in rows:
+        old = masks[y + dy]
+        masks[y + dy] |= bits << shift
+        key ^= ROW_KEYS[y + dy][old] ^ ROW_KEYS[y + dy][masks[y + dy]]
+        full += masks[y + dy] == FULL
+    if full:
+        return survey([0] * full + [mask for mask in masks if mask != FULL]), full
+
+    edges = range(max(shift - 1, 0), min(x + right + 1, COLS - 1))
+    heights = list(heights)
+    for i in edges:
+        bump -= abs(heights[i] - heights[i + 1])
+    for dx, low, high in columns:
+        holes += ROWS - heights[x + dx] - y - low - 1
+        total += ROWS - y - high - heights[x + dx]
+        heights[x + dx] = ROWS - y - high
+    for i in edges:
+        bump += abs(heights[i] - heights[i + 1])
+    return (tuple(masks), tuple(heights), holes, total, bump, key), 0
+
+
+class TranspositionTable:
+    # bounded LRU of search results; the same board comes up again through other move orders
+    # and as the root of the next decision
+
+    def __init__(self, capacity=TABLE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0,
+        }
+
+
+class Bot:
+    # picks (x, orient) for Game.place: every drop of the current figure is scored, the best few
+    # are expanded with every drop of the next figure and the best pair decides
+
+    def __init__(self, weights=WEIGHTS, width=BEAM, capacity=TABLE_SIZE):
+        self.weights = weights
+        self.width = width
+        self.table = TranspositionTable(capacity)
+
+    def __getstate__(self):
+        # the table stays in its process; a pickled bot (a tournament worker's) starts with an empty one
+        return self.weights, self.width, self.table.capacity
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def evaluate(self, state, lines) -> float:
+        height, cleared, hole, bump = self.weights
+        return height * state[3] + cleared * lines + hole * state[2] + bump * state[4]
+
+    def expand(self, state, shape) -> list:
+        # every drop of shape as (value, x, orient, piece, lines), best first; looked up by the
+        # state's Zobrist key, and kept without the resulting states to stay small
+        key = state[5], shape
+        results = self.table.get(key)
+        if results is None:
+            results = []
+            for orient, piece in PIECES[shape]:
+                left, right = piece[0], piece[1]
+                for x in range(-left, COLS - right):
+                    result = drop(state, piece, x)
+                    if result is not None:
+                        new, lines = result
+                        results.append((self.evaluate(new, lines), x, orient, piece, lines))
+            results.sort(key=lambda result: result[0], reverse=True)
+            self.table.put(key, results)
+        return results
+
+    def choose(self, shape, next_shape, state) -> (int, int):
+        first = self.expand(state, shape)
+        if not first:
+            return 5, 0
+
+        best, choice = None, first[0][1:3]
+        for value, x, orient, piece, lines in first[:self.width]:
+            second = self.expand(drop(state, piece, x)[0], next_shape)
+            value = second[0][0] + self.weights[1] * lines if second else value - 1000
+            if best is None or value > best:
+                best, choice = value, (x, orient)
+        return choice
+
+    def __call__(self, game) -> (int, int):
+        return self.choose(game.field.figure.figure, game.next_figure, snapshot(game.field))
+
+
+agent = Bot()
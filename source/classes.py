@@ -1,177 +1,88 @@
-import random
-
 import pygame
-from settings import FIGURE_DATA, FIGURE_NAMES, TILE, GAP, NEW_DELAY, vec
+from settings import FIGURE_DATA, TILE, vec
 from audio import Mixer
+from rules import Board, Bag
 
 
-class Matrix:
-
-    def __init__(self, cols, rows):
-        self.cols = cols
-        self.rows = rows
-        self.data = [[0 for _ in range(cols)] for __ in range(rows)]
-        self.index = [0, 0]
-
-    def __getitem__(self, index: (int, int)) -> int:
-        x, y = index
-        return self.data[int(y)][int(x)]
-
-    def __setitem__(self, index: (int, int), item):
-        x, y = index
-        self.data[int(y)][int(x)] = item
-
-    def __iter__(self):
-        self.index = [0, 0]
-        return self
-
-    def __next__(self) -> (int, int, str):
-        self.index[0] += 1
-        if self.index[0] > self.cols:
-            self.index[0] = 0
-            self.index[1] += 1
-            if self.index[1] > self.rows:
-                raise StopIteration
-        return self.index[0] - 1, self.index[1] - 1, self[self.index[0] - 1, self.index[1] - 1]
-
-    def del_row(self, row):
-        del self.data[row]
-        self.data.insert(0, [0 for _ in range(self.cols)])
-
-
-class Field(pygame.Surface, Matrix):
+class Field(pygame.Surface, Board):
 
     def __init__(self, engine, dim, _next):
         pygame.Surface.__init__(self, (dim[2] * TILE, dim[3] * TILE))
-        Matrix.__init__(self, dim[2], dim[3])
-        self.engine = engine
+        Board.__init__(self, engine, dim, _next)
         self.dim = dim
         self.rect = self.get_rect()
         self.rect.topleft = dim[:2]
-        self.figure = Figure(self)
-        self.figure.reset(_next)
 
         self.background = pygame.Surface((dim[2] * TILE, dim[3] * TILE))
+        self.stack = pygame.Surface((dim[2] * TILE, dim[3] * TILE))
+        self.stack_theme = None
 
-    def collide_figure(self, sides=True, pos=0):
-        for x, y in self.figure:
-            if sides and x < 0:
-                return 2
-            if sides and x >= self.cols:
-                return 3
-            if y + pos >= self.rows or self[x, y + pos]:
-                return 1
-        else:
-            return 0
+    def __setitem__(self, index, item):
+        Board.__setitem__(self, index, item)
+        self.paint(*index)
+
+    def set_row(self, row, item):
+        Board.set_row(self, row, item)
+        for x in range(self.cols):
+            self.paint(x, row)
+
+    def del_row(self, row):
+        Board.del_row(self, row)
+        self.stack.set_clip((0, 0, self.cols * TILE, (row + 1) * TILE))
+        self.stack.scroll(0, TILE)
+        self.stack.set_clip(None)
+        self.stack.fill(self.engine.graphics['field'], (0, 0, self.cols * TILE, TILE))
+
+    def paint(self, x, y, tile=None):
+        # keeps the settled stack layer in sync with one cell of the matrix
+        x, y = int(x), int(y)
+        tile = self.data[y][x] if tile is None else tile
+        self.stack.fill(self.engine.graphics['field'], (x * TILE, y * TILE, TILE, TILE))
+        if tile:
+            self.stack.blit(*self.engine.graphics.tile(tile, (x * TILE, y * TILE)))
 
     @Mixer.play("low blip")
     def drop_figure(self, merge=False):
-        if not self.collide_figure(False, 1):
-            self.figure.pos += vec(0, 1)
-        elif merge:
-            self.merge_figure()
+        return Board.drop_figure(self, merge)
 
     @Mixer.play("blip")
     def move_figure(self, vector):
-        self.figure.pos += vector
-        if self.collide_figure():
-            self.figure.pos -= vector
-            return False
-        else:
-            return True
+        return Board.move_figure(self, vector)
 
-    @Mixer.play("blip")
+    @Mixer.play("blip", on_success=True)
     def rotate_figure(self, direction):
-        if self.figure.pos[1] == 0:
-            self.figure.pos[1] = 1
-
-        temp = self.figure.orient
-        self.figure.orient = (self.figure.orient + direction) % len(self.figure.data)
-
-        if self.collide_figure() == 1:
-            self.figure.orient = temp
-        if self.collide_figure() == 2:
-            if not self.move_figure(vec(2 if self.figure.figure == "I" else 1, 0)):
-                self.figure.orient = temp
-        if self.collide_figure() == 3:
-            if not self.move_figure(vec(-1, 0)):
-                self.figure.orient = temp
-
-    def place_figure(self):
-        self.figure.pos += vec(0, self.height())
-        self.merge_figure()
+        return Board.rotate_figure(self, direction)
 
     @Mixer.play("high blip")
     def merge_figure(self):
         for x, y in self.figure:
-            self[x, y] = self.figure.figure
-        self.figure.reset(self.engine.next_figure)
-
-        if self.collide_figure() == 1:
-            self.engine.game_over()
-        if self.collide_figure() == 2:
-            self.move_figure(vec((1, 2)[self.figure.figure == "I"], 0))
-        if self.collide_figure() == 3:
-            self.move_figure(vec(-1, 0))
-
-        self.engine.delay(NEW_DELAY)
-        self.engine.next_figure = self.engine.next()
+            self.paint(x, y, self.figure.figure)
+        return Board.merge_figure(self)
 
     def render(self, surface):
-        self.fill(self.engine.graphics['field'])
-        height = self.height()
-
-        for x, y, tile in self:
-            if tile:
-                self.blit(self.engine.graphics[tile], (x * TILE, y * TILE))
-
+        graphics = self.engine.graphics
+        atlas, areas = graphics.atlas, graphics.areas
+        if self.stack_theme != graphics.theme:
+            self.stack_theme = graphics.theme
+            self.stack.fill(graphics['field'])
+            self.stack.blits([(atlas, (x * TILE, y * TILE), areas[tile]) for x, y, tile in self if tile], False)
+
+        self.blit(self.stack, (0, 0))
+
+        # the figure and its shadow, a cell at a time as before, so the shadow still draws over the figure
+        tile, batch = areas[self.figure.figure], []
+        shadow = areas["shadow"] if self.engine.shadow_switch.state else None
+        height = self.height() if shadow else 0
         for x, y in self.figure:
-            self.blit(self.engine.graphics[self.figure.figure], (x * TILE, y * TILE))
-
-            if self.engine.shadow_switch.state:
-                rect = pygame.Rect(x * TILE + GAP, (y + height) * TILE + GAP, TILE - GAP * 2, TILE - GAP * 2)
-                pygame.draw.rect(self, self.engine.graphics["shadow"], rect, 2)
+            batch.append((atlas, (x * TILE, y * TILE), tile))
+            if shadow:
+                batch.append((atlas, (x * TILE, (y + height) * TILE), shadow))
+        self.blits(batch, False)
 
         surface.blit(self, self.rect)
 
-    def height(self, distance=0):
-        while not self.collide_figure(pos=distance):
-            distance += 1
-        return distance - 1
-
-
-class Figure:
 
-    def __init__(self, engine):
-        self.data = None
-        self.figure = None
-        self.engine = engine
-        self.orient = 0
-        self.index = 0
-        self.pos = vec(5, 0)
-
-    def __getitem__(self, index):
-        return self.data[self.orient][index]
-
-    def __iter__(self):
-        self.index = 0
-        return self
-
-    def __next__(self):
-        self.index += 1
-        if self.index > 4:
-            raise StopIteration
-        x, y = vec(self[self.index - 1]) + self.pos
-        return x, y
-
-    def reset(self, shape):
-        self.pos = vec(5, 0)
-        self.orient = 0
-        self.data = FIGURE_DATA[shape][:]
-        self.figure = shape
-
-
-class Next:
+class Next(Bag):
     POS = {
         'O': (1.5, 1.5),
         'I': (2.5, 2),
@@ -182,20 +93,17 @@ class Next:
         'Z': (2, 1.5)
     }
 
-    def __init__(self, engine, pos):
+    def __init__(self, engine, pos, seed=None):
+        super().__init__(seed)
         self.engine = engine
         self.pos = pos
-        self.container = list(FIGURE_NAMES[:])
-
-    def __call__(self):
-        figure = random.choice(self.container)
-        self.container.remove(figure)
-        if not self.container:
-            self.container = list(FIGURE_NAMES[:])
-        return figure
+        # where every shape's tiles go, worked out once
+        self.tiles = {
+            figure: [(vec(element) + vec(Next.POS[figure])) * TILE + pos for element in FIGURE_DATA[figure][0]]
+            for figure in Next.POS
+        }
 
     def render(self, surface):
         figure = self.engine.next_figure
-        array = [vec(element) + vec(Next.POS[figure]) for element in FIGURE_DATA[figure][0]]
-        for x, y in array:
-            surface.blit(self.engine.graphics[figure], vec(x * TILE, y * TILE) + self.pos)
+        atlas, area = self.engine.graphics.atlas, self.engine.graphics.areas[figure]
+        surface.blits([(atlas, pos, area) for pos in self.tiles[figure]], False)
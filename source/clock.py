@@ -1,4 +1,14 @@
-import pygame
+import heapq
+from itertools import count
+from operator import attrgetter
+
+try:
+    import pygame
+except ImportError:  # fixed-step clocks can run headless
+    pygame = None
+
+MAX_STEPS = 5
+ORDER = attrgetter("order")
 
 
 class Timer:
@@ -11,39 +21,69 @@ class Timer:
             method=None,
     ):
 
-        clock.timers.append(self)
+        clock.timers.add(self)
         self.clock = clock
-        self.period = period
+        self.order = next(clock.counter)
+        self.entry = None
+        self.period = clock.duration(period)
         self.periodic = periodic
 
         self.statemark = self.clock.now - int(not running) * self.period
-        self.modifier = 1
+        self._modifier = 1
 
         self.running = running
         self.signal = [initial_value, False]
 
         self.method = method
+        self.schedule()
+
+    @property
+    def modifier(self) -> float:
+        return self._modifier
+
+    @modifier.setter
+    def modifier(self, value):
+        self._modifier = value
+        self.schedule()
 
     @property
     def progress(self) -> float:  # (0; 1]
         return self.raw_progress if self.running else 1
 
+    @property
+    def deadline(self) -> float:
+        return self.statemark + self.period * self.modifier
+
     @property
     def raw_progress(self) -> float:
         return (self.clock.now - self.statemark) / (self.period * self.modifier)
 
+    def schedule(self):
+        # re-queue on the clock's heap after any change to the deadline; the old entry is left to go stale
+        self.clock.cancel(self)
+        if self.running:
+            self.clock.push(self)
+        self.clock.touched.add(self)
+
     def force(self):
         self.running = True
         self.statemark = -self.period
+        self.schedule()
 
     def reset(self, period=None):
         self.statemark = self.clock.now
         self.running = True
         if period is not None:
-            self.period = period
+            self.period = self.clock.duration(period)
+        self.schedule()
 
     def delay(self, period):
-        self.statemark = self.clock.now + period
+        self.statemark = self.clock.now + self.clock.duration(period)
+        self.schedule()
+
+    def stop(self):
+        self.running = False
+        self.schedule()
 
     def update(self):
         self.signal[1] = self.signal[0]
@@ -51,13 +91,22 @@ class Timer:
             self.signal[0] = False
             if self.clock.now - self.statemark >= self.period * self.modifier:
                 self.signal[0] = True
+                self.clock.fires += 1
                 self.running = self.periodic
                 self.statemark = self.clock.now
+                self.schedule()
                 if self.method is not None:
                     self.method()
                     if not self.periodic:
                         self.method = None
 
+    @property
+    def settled(self) -> bool:
+        # an update() would leave the signal as it is
+        if self.running:
+            return not any(self.signal)
+        return self.signal[0] == self.signal[1]
+
     def query(self, period=None) -> bool:
         if self.signal[0] and period is not None:
             self.reset(period)
@@ -75,28 +124,111 @@ class Timer:
             self.reset()
 
     def kill(self):
-        if self in self.clock.timers:
-            self.clock.timers.remove(self)
+        self.clock.cancel(self)
+        self.clock.timers.discard(self)
+        self.clock.touched.discard(self)
         del self
 
 
 class Clock:
-
-    def __init__(self):
-        self.clock = pygame.time.Clock()
-        self.timers = []
+    # rate=None follows the wall clock in milliseconds; with a rate (ticks per second) time is an integer
+    # tick counter advanced by step(), so every duration is in ticks and runs are reproducible.
+    # Timers wait on a heap keyed by deadline, so an update only visits the ones that are due
+    # plus the few whose signal still has to fall back after firing or being reset.
+
+    def __init__(self, rate=None):
+        self.clock = pygame.time.Clock() if pygame is not None else None
+        self.rate = rate
+        self.timers = set()
+        self.heap = []
+        self.alarms = []  # the same entries again for timers with a method, the only ones that wake the loop
+        self.touched = set()
+        self.spare = set()
+        self.counter = count()
+        self.fires = 0
         self.now = 0
         self.dt = 0
+        self.ticks = 0
+        self.accumulator = 0
 
     def timer(self, *args, **kwargs) -> Timer:
         return Timer(self, *args, **kwargs)
 
+    def duration(self, ms):
+        if self.rate is None:
+            return ms
+        return max(1, round(ms * self.rate / 1000))
+
+    def ms(self, duration) -> float:
+        return duration if self.rate is None else duration * 1000 / self.rate
+
+    def push(self, timer):
+        timer.entry = [timer.deadline, next(self.counter), timer]
+        heapq.heappush(self.heap, timer.entry)
+        if timer.method is not None:
+            heapq.heappush(self.alarms, timer.entry)
+
+    def cancel(self, timer):
+        if timer.entry is not None:
+            timer.entry[2] = None
+            timer.entry = None
+
+    def prune(self):
+        # entries go stale on the alarm heap when cancelled, fired or their method is dropped; popping
+        # them off the top keeps its head live and the heap from growing when nobody asks
+        alarms = self.alarms
+        while alarms and (alarms[0][2] is None or alarms[0][2].entry is not alarms[0] or alarms[0][2].method is None):
+            heapq.heappop(alarms)
+
+    def next_deadline(self):
+        # only timers with a scheduled method need the loop awake; polled signals are read by the loop itself
+        self.prune()
+        return self.alarms[0][0] if self.alarms else None
+
     def update(self):
-        self.now = pygame.time.get_ticks()
-        for timer in self.timers:
-            timer.update()
+        self.now = pygame.time.get_ticks() if self.rate is None else self.ticks
+
+        # the two sets take turns as this update's due list and the next one's touched set
+        due, self.touched = self.touched, self.spare
+        while self.heap and self.heap[0][0] <= self.now:
+            deadline, sequence, timer = heapq.heappop(self.heap)
+            if timer is not None:
+                timer.entry = None
+                due.add(timer)
+
+        if due:
+            for timer in sorted(due, key=ORDER):
+                timer.update()
+                if timer.running and timer.entry is None:
+                    self.push(timer)
+                if not timer.settled:
+                    self.touched.add(timer)
+            due.clear()
+        self.spare = due
+        if self.alarms:
+            self.prune()
 
     def tick(self, fps) -> float:
-        self.update()
-        self.dt = self.clock.tick(fps) / 1000
+        if self.rate is None:
+            self.update()
+            self.dt = self.clock.tick(fps) / 1000
+        else:
+            self.dt = self.clock.tick(fps) / 1000
+            self.accumulator += self.dt * self.rate
         return self.dt
+
+    def steps(self) -> int:
+        # whole fixed ticks owed since the last frame; wall-clock mode always runs one step per frame
+        if self.rate is None:
+            return 1
+        steps = int(self.accumulator)
+        if steps > MAX_STEPS:
+            steps, self.accumulator = MAX_STEPS, 0
+        else:
+            self.accumulator -= steps
+        return steps
+
+    def step(self):
+        if self.rate is not None:
+            self.ticks += 1
+            self.update()
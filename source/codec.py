@@ -0,0 +1,29 @@
+def varint(value) -> bytes:
+    # unsigned LEB128: 7 bits per byte, high bit set on every byte but the last
+    out = bytearray()
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def read_varint(data, pos=0) -> (int, int):
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise EOFError("truncated varint")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def zigzag(value) -> int:
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def unzigzag(value) -> int:
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
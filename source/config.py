@@ -0,0 +1,93 @@
+import json
+import os
+from configparser import ConfigParser
+
+SOURCE_PATH = os.path.dirname(__file__)
+ROOT = os.path.split(SOURCE_PATH)[0]
+
+FPS = 60
+IDLE_TIMEOUT = 1000
+SCORE = (0, 40, 100, 300, 1200)
+
+PATH = {
+    "data": os.path.join(ROOT, "data"),
+    "datafile": os.path.join(ROOT, "data", "data.json"),
+    "config": os.path.join(ROOT, "data", "config.ini"),
+    "font": os.path.join(ROOT, "data", "font.ttf"),
+    "audio": os.path.join(ROOT, "data", "audio"),
+    "graphics": os.path.join(ROOT, "graphics"),
+    "replays": os.path.join(ROOT, "replays"),
+    "profiles": os.path.join(ROOT, "profiles"),
+    "cache": os.path.join(ROOT, "cache"),
+    "source": SOURCE_PATH,
+}
+
+parser = ConfigParser()
+parser.read(PATH["config"])
+# bindings added after the first release, so config files older than them still start
+for _key, _value in (("autoplay", "b"), ("profiler", "p"), ("dump profile", "o")):
+    parser["KEYS"].setdefault(_key, _value)
+
+DELAY = parser.getint("SETTINGS", "base period")
+TILE = parser.getint("SETTINGS", "tile size")
+VOLUME = parser.getint("SETTINGS", "volume") / 100
+STARTING_LEVEL = parser.getint("SETTINGS", "starting level")
+MAX_LEVEL = parser.getint("SETTINGS", "max level")
+KILLER_MODIFIER = parser.getfloat("SETTINGS", "killer modifier")
+NEW_DELAY = parser.getint("SETTINGS", "new delay")
+THEME = parser.getboolean("SETTINGS", "theme")
+REPLAYS = parser.getboolean("SETTINGS", "record replays", fallback=True)
+TICK_RATE = parser.getint("SETTINGS", "tick rate", fallback=60)
+ASSET_CACHE = parser.getboolean("SETTINGS", "asset cache", fallback=True)
+
+GAP = TILE // 12
+FIELD = 10, 20
+HEAD = int(TILE * 0.8)
+
+DIM = {
+    "screen": (TILE * (FIELD[0] + 5), TILE * FIELD[1] + HEAD),
+    "field": (0, HEAD, *FIELD),
+    "next": (TILE * FIELD[0], TILE // 2 + HEAD),
+    "next_label": (TILE * (FIELD[0] + 2.5), TILE + HEAD),
+    "next_area": (TILE * FIELD[0], HEAD, TILE * 5, TILE * 5),
+    "score_area": (TILE * FIELD[0], TILE * 5 + HEAD, TILE * 5, int(TILE * 2.5)),
+    "level_area": (TILE * FIELD[0], int(TILE * 7.5) + HEAD, TILE * 5, int(TILE * 2.5)),
+    "score": (TILE * (FIELD[0] + 2.5), TILE * 5.5 + HEAD),
+    "level": (TILE * (FIELD[0] + 2.5), TILE * 8 + HEAD),
+    "shadow_switch": (TILE * (FIELD[0] + 1.5), TILE * 11 + HEAD),
+    "sound_switch": (TILE * (FIELD[0] + 1.5), TILE * 13.5 + HEAD),
+    "music_switch": (TILE * (FIELD[0] + 1.5), TILE * 16 + HEAD),
+    "theme_switch": (TILE * (FIELD[0] + 1.5), TILE * 18.5 + HEAD),
+    "label": (TILE * (FIELD[0] // 2), TILE * (FIELD[1] // 2)),
+    "header": (0, 0, TILE * (FIELD[0] + 5), HEAD),
+    "header_text": (GAP, GAP),
+    "exit_button": (TILE * (FIELD[0] + 5) - HEAD, 0, HEAD, HEAD),
+    "keys_button": (TILE * (FIELD[0] + 5) - HEAD * 2 + GAP, 0, HEAD, HEAD),
+    "keys_tooltip": (TILE * (FIELD[0] + 5) - HEAD * 2 + GAP, HEAD),
+    "profile": (GAP, HEAD + GAP, TILE * FIELD[0] - GAP * 2, TILE * 4.5),
+}
+
+KEY_DELAYS = {
+    "exit": (1000, 1000),
+    "pause": (1000, 1000),
+    "reset": (1000, 1000),
+    "rotate cw": (500, 100),
+    "rotate ccw": (500, 100),
+    "rotate": (500, 100),
+    "move left": (120, 20),
+    "move right": (120, 20),
+    "move down": (120, 20),
+    "place": (1000, 1000),
+    "theme": (1000, 1000),
+    "autoplay": (1000, 1000),
+    "profiler": (1000, 1000),
+    "dump profile": (1000, 1000),
+}
+
+with open(PATH["datafile"], 'r') as FILE:
+    DATA = json.load(FILE)
+
+    FIGURE_DATA = DATA["figures"]
+    FIGURE_NAMES = tuple(FIGURE_DATA.keys())
+    SOUND_DATA = DATA["sounds"]
+    THEMES = ("dark", "light")
@@ -0,0 +1,200 @@
+from codec import varint, read_varint, zigzag, unzigzag
+from config import FIGURE_NAMES
+from rules import SHAPES
+
+MAGIC = b"TDL"
+VERSION = 1
+KEYFRAME_INTERVAL = 600  # frames between keyframes, so a client that joins late or loses sync recovers
+
+CELLS = (0,) + FIGURE_NAMES + ("X", "#")
+CODES = {cell: code for code, cell in enumerate(CELLS)}
+OPS = ("set", "set row", "del row", "merge")
+DELTA, KEYFRAME = 0, 1
+FIGURE, NEXT, SCORE, OVER = 1, 2, 4, 8
+
+# stream layout: MAGIC, version byte, then frames of varint length + payload
+# payload: kind byte, varint tick, then
+#   keyframe: cols, rows, one cell code per cell, figure, next, score, over
+#   delta: varint op count, the ops, a byte of flags saying which of figure, next, score, over follow
+# ops: set: op, varint y * cols + x, code | set row: op, row, code | del row: op, row
+#      merge: op, figure code, orient, zigzag x, varint y
+# figure: code, orient, zigzag x, varint y | next: code | score: varint score, varint level | over: byte
+
+
+def encode_figure(shape, orient, x, y) -> bytes:
+    return bytes((CODES[shape], orient)) + varint(zigzag(x)) + varint(y)
+
+
+def decode_figure(data, pos) -> (tuple, int):
+    shape, orient = CELLS[data[pos]], data[pos + 1]
+    x, pos = read_varint(data, pos + 2)
+    y, pos = read_varint(data, pos)
+    return (shape, orient, unzigzag(x), y), pos
+
+
+class Stream:
+    # turns the journal of one game's board into frames; the first frame and every
+    # KEYFRAME_INTERVAL-th one (or any frame after the game swapped its field) is a keyframe
+
+    def __init__(self, game, interval=KEYFRAME_INTERVAL):
+        self.game = game
+        self.interval = interval
+        self.field = None
+        self.count = 0
+        self.state = None
+
+    def header(self) -> bytes:
+        return MAGIC + bytes((VERSION,))
+
+    def figure(self) -> tuple:
+        figure = self.game.field.figure
+        return figure.figure, figure.orient, figure.pos[0], figure.pos[1]
+
+    def frame(self, tick) -> bytes:
+        if self.game.field is not self.field or self.count % self.interval == 0:
+            return self.keyframe(tick)
+        self.count += 1
+
+        game, journal = self.game, self.field.journal
+        state = self.figure(), game.next_figure, (game.score, game.level), game.over
+        flags = sum(flag for flag, a, b in zip((FIGURE, NEXT, SCORE, OVER), state, self.state) if a != b)
+        if not journal and not flags:
+            return b""
+
+        cols = self.field.cols
+        payload = bytearray((DELTA,)) + varint(tick) + varint(len(journal))
+        for op, *args in journal:
+            payload.append(OPS.index(op))
+            if op == "set":
+                x, y, item = args
+                payload += varint(y * cols + x)
+                payload.append(CODES[item])
+            elif op == "set row":
+                payload += bytes((args[0], CODES[args[1]]))
+            elif op == "del row":
+                payload.append(args[0])
+            else:
+                payload += encode_figure(*args)
+        journal.clear()
+
+        payload.append(flags)
+        if flags & FIGURE:
+            payload += encode_figure(*state[0])
+        if flags & NEXT:
+            payload.append(CODES[state[1]])
+        if flags & SCORE:
+            payload += varint(game.score) + varint(game.level)
+        if flags & OVER:
+            payload.append(game.over)
+        self.state = state
+        return varint(len(payload)) + payload
+
+    def keyframe(self, tick) -> bytes:
+        game = self.game
+        if self.field is not game.field:
+            if self.field is not None:
+                self.field.journal = None
+            self.field = game.field
+        self.field.journal = []
+        self.count = 1
+
+        self.state = self.figure(), game.next_figure, (game.score, game.level), game.over
+        payload = bytearray((KEYFRAME,)) + varint(tick) + bytes((self.field.cols, self.field.rows))
+        payload += bytes(CODES[cell] for row in self.field.data for cell in row)
+        payload += encode_figure(*self.state[0])
+        payload.append(CODES[game.next_figure])
+        payload += varint(game.score) + varint(game.level)
+        payload.append(game.over)
+        return varint(len(payload)) + payload
+
+
+class Mirror:
+    # client side: rebuilds the board and game state from a stream, fed in chunks of any size
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.started = False
+        self.synced = False
+        self.cols = self.rows = 0
+        self.data = []
+        self.tick = 0
+        self.figure = None
+        self.next_figure = None
+        self.score = self.level = 0
+        self.over = False
+
+    def feed(self, data) -> int:
+        # applies every complete frame in the buffer; returns how many there were
+        self.buffer += data
+        if not self.started:
+            if len(self.buffer) < len(MAGIC) + 1:
+                return 0
+            if self.buffer[:len(MAGIC)] != MAGIC or self.buffer[len(MAGIC)] != VERSION:
+                raise ValueError(f"not a version {VERSION} delta stream")
+            del self.buffer[:len(MAGIC) + 1]
+            self.started = True
+
+        count = pos = 0
+        while True:
+            try:
+                length, start = read_varint(self.buffer, pos)
+            except EOFError:
+                break
+            if start + length > len(self.buffer):
+                break
+            self.apply(self.buffer, start)
+            pos = start + length
+            count += 1
+        del self.buffer[:pos]
+        return count
+
+    def apply(self, data, pos):
+        kind = data[pos]
+        self.tick, pos = read_varint(data, pos + 1)
+        if kind == KEYFRAME:
+            self.cols, self.rows = data[pos], data[pos + 1]
+            pos += 2
+            cells = [CELLS[code] for code in data[pos:pos + self.cols * self.rows]]
+            self.data = [cells[y * self.cols:(y + 1) * self.cols] for y in range(self.rows)]
+            pos += self.cols * self.rows
+            self.figure, pos = decode_figure(data, pos)
+            self.next_figure = CELLS[data[pos]]
+            self.score, pos = read_varint(data, pos + 1)
+            self.level, pos = read_varint(data, pos)
+            self.over = bool(data[pos])
+            self.synced = True
+            return
+        if not self.synced:
+            return  # deltas only make sense on top of a keyframe
+
+        count, pos = read_varint(data, pos)
+        for _ in range(count):
+            op = OPS[data[pos]]
+            if op == "set":
+                index, pos = read_varint(data, pos + 1)
+                self.data[index // self.cols][index % self.cols] = CELLS[data[pos]]
+                pos += 1
+            elif op == "set row":
+                self.data[data[pos + 1]] = [CELLS[data[pos + 2]]] * self.cols
+                pos += 3
+            elif op == "del row":
+                del self.data[data[pos + 1]]
+                self.data.insert(0, [0] * self.cols)
+                pos += 2
+            else:
+                (shape, orient, x, y), pos = decode_figure(data, pos + 1)
+                for dx, dy in SHAPES[shape][orient].cells:
+                    self.data[y + dy][x + dx] = shape
+
+        flags = data[pos]
+        pos += 1
+        if flags & FIGURE:
+            self.figure, pos = decode_figure(data, pos)
+        if flags & NEXT:
+            self.next_figure = CELLS[data[pos]]
+            pos += 1
+        if flags & SCORE:
+            self.score, pos = read_varint(data, pos)
+            self.level, pos = read_varint(data, pos)
+        if flags & OVER:
+            self.over = bool(data[pos])
@@ -1,39 +1,57 @@
-from ctypes import windll, wintypes, pointer
+import os
+import sys
+import time
 
 import pygame
-from graphics import Graphics
+from graphics import Graphics, TextCache
 
 from audio import Mixer
+from bot import Bot
 from classes import Field, Next
 from clock import Clock
 from events import EventHandler
 from interface import Widget, Button, Switch, KeyTooltip
-from settings import DIM, FPS, KEYS, FONT, TILE, DELAY, VOLUME, SCORE, MAX_LEVEL, STARTING_LEVEL, \
-    KILLER_MODIFIER, vec, parser
-
-
-class Engine:
-    display = pygame.display.set_mode(DIM["screen"], pygame.NOFRAME)
+from profiler import Profiler
+from replay import Recorder, load, frames
+from rules import Game
+from settings import DIM, FPS, GAP, IDLE_TIMEOUT, TILE, DELAY, VOLUME, REPLAYS, TICK_RATE, PATH, vec, parser
+from settings import init, keys, fonts
+
+if sys.platform == "win32":
+    from ctypes import windll, wintypes, pointer
+else:
+    windll = None  # the frameless window is dragged through the Win32 API only
+
+
+class Engine(Game):
+    deferred_clear = True
+    recording = REPLAYS
+    tick_rate = TICK_RATE or None
     IMAGES = None
     TITLE = "Tetris"
-    ICON = pygame.image.load('../data/tetris.png')
+    TEXT = TextCache(fonts)
 
     def __init__(self):
-
+        # everything with a side effect starts here rather than on import: the window, fonts on
+        # the first text drawn, sounds on their first play and the music when it is turned on
+        init()
+        Mixer.init()
         Mixer.set_volume(VOLUME)
-        self.window_handle = pygame.display.get_wm_info()['window']
+        self.display = pygame.display.set_mode(DIM["screen"], pygame.NOFRAME)
+        self.window_handle = pygame.display.get_wm_info().get('window')
 
-        pygame.display.set_icon(self.ICON)
+        pygame.display.set_icon(pygame.image.load(os.path.join(PATH["data"], "tetris.png")))
         pygame.display.set_caption(self.TITLE)
 
         self.graphics = Graphics(self)
 
-        self.clock = Clock()
+        self.clock = Clock(self.tick_rate)
         self.logic_timer = self.clock.timer(DELAY, periodic=True)
         self.tick_timer = self.clock.timer(30, periodic=True)
         self.timer = self.clock.timer(30)
+        self.bot_timer = self.clock.timer(50, periodic=True)
 
-        self.event_handler = EventHandler(self.clock, KEYS)
+        self.event_handler = EventHandler(self.clock, keys())
         self.key_tooltip = KeyTooltip(self, DIM["keys_tooltip"])
 
         self.exit_button = Button(self, self.event_handler, DIM["exit_button"], "text_1")
@@ -43,32 +61,54 @@ class Engine:
         self.sound_switch = Switch(self, self.event_handler, DIM["sound_switch"], "Sound")
         self.theme_switch = Switch(self, self.event_handler, DIM["theme_switch"], "Light")
         self.header = Widget(self, self.event_handler, DIM["header"])
+        self.switches = (self.shadow_switch, self.music_switch, self.sound_switch, self.theme_switch)
+        self.widgets = (self.exit_button, self.keys_button) + self.switches
+        self.layers = {}
+        self.dirty = []  # rects pushed to the screen this frame, reused from frame to frame
+        self.hud = None
+        self.hud_theme = None
 
         self.running = [False, False, False]
+        self.recorder = None
+        self.bot = Bot()
+        self.autoplay = False
+        self.profiler = Profiler()
+        self.profiling = False
+        self.profile_panel = None
 
         self.reset()
         self.running[1] = True
 
-    def reset(self):
-        self.next = Next(self, DIM['next'])
-        self.field = Field(self, DIM['field'], self.next())
-        self.next_figure = self.next()
+    def reset(self, seed=None):
+        Game.reset(self, seed)
+
+        if self.recorder is not None:
+            self.recorder.close()
+        self.recorder = Recorder.create(self.seed, self.clock.now, self.clock.rate) if self.recording else None
 
         self.background_shade = self.field.background
         self.background_shade.set_alpha(160)
         self.background_shade.fill((0, 0, 0))
 
         self.logic_timer.modifier = 1
+        self.plan = None
 
         if self.running[2] and self.music_switch.state:
-            Mixer.theme.play(-1)
+            Mixer.play_theme()
 
         self.running = [True, self.running[1], False]
+        self.logic_timer.modifier = self.modifier
+
+    def new_next(self, seed):
+        return Next(self, DIM['next'], seed)
+
+    def new_field(self, figure):
+        return Field(self, DIM['field'], figure)
 
-        self.lines = 0
-        self.score = 0
-        self.level = min(self.lines // 10 + STARTING_LEVEL, MAX_LEVEL)
-        self.logic_timer.modifier = (KILLER_MODIFIER ** (1 / MAX_LEVEL)) ** (self.level - 1)
+    def act(self, action):
+        if self.recorder is not None:
+            self.recorder.record(self.clock.now, action)
+        Game.act(self, action)
 
     def delay(self, time=DELAY * 0.5):
         self.logic_timer.delay(time)
@@ -87,15 +127,21 @@ class Engine:
             self.reset()
         if self.event_handler['theme', 'press']:
             self.theme_switch.flip()
+        if self.event_handler['autoplay', 'press']:
+            self.autoplay = not self.autoplay
+        if self.event_handler['profiler', 'press']:
+            self.profiling = not self.profiling
+        if self.event_handler['dump profile', 'press']:
+            self.dump_profile()
 
         if not pygame.key.get_focused():  # or not pygame.mouse.get_focused():  # (only for extreme focus mode)
             self.running[1] = True
 
         if self.music_switch.clicked:
             if self.music_switch.state:
-                Mixer.theme.stop()
+                Mixer.stop_theme()
             else:
-                Mixer.theme.play(-1)
+                Mixer.play_theme()
 
         Mixer.enabled = self.sound_switch.state
 
@@ -108,80 +154,137 @@ class Engine:
         if self.event_handler.hold[0] and self.header.focused:
             self.drag_window()
 
+        for switch in self.switches:
+            switch.update()
+
         if not any(self.running[1:]):
-            if self.event_handler["rotate cw", "press"]:
-                self.field.rotate_figure(-1)
-            if self.event_handler["rotate ccw", "press"]:
-                self.field.rotate_figure(1)
-            if self.event_handler["rotate", "press"]:
-                self.field.rotate_figure(1)
-            if self.event_handler["move left", "press"]:
-                self.field.move_figure(vec(-1, 0))
-            if self.event_handler["move right", "press"]:
-                self.field.move_figure(vec(1, 0))
+            for action in ("rotate cw", "rotate ccw", "rotate", "move left", "move right"):
+                if self.event_handler[action, "press"]:
+                    self.act(action)
             if self.event_handler["move down", "press"] and self.timer.query():
                 self.timer.reset()
                 self.logic_timer.reset()
-                self.field.drop_figure()
+                self.act("move down")
             if self.event_handler["place", "press"]:
-                self.field.place_figure()
+                self.act("place")
 
     def logic(self):
         if not any(self.running[1:]):
+            if self.autoplay and self.bot_timer.query():
+                self.steer()
             if self.logic_timer.query():
-                self.field.drop_figure(True)
-            if self.tick_timer.query():
-                for i, row in enumerate(self.field.data):
-                    for j in range(len(row)):
-                        if self.field[j, i] == 'X':
-                            self.field[j, i] = '#'
-                            break
-            temp, sound = 0, False
-            for i, row in enumerate(self.field.data):
-                if row == ['#' for i in range(self.field.cols)]:
-                    self.field.del_row(i)
-                    temp += 1
-                elif 0 not in row and 'X' not in row:
-                    sound = True
-                    self.field.data[i] = ['X' for i in range(self.field.cols)]
-            if sound:
-                if Mixer.enabled:
-                    Mixer.SOUNDS["clear"].play()
-
-            # progress
-            if temp:
-                self.lines += temp
-                self.level = min(self.lines // 10 + STARTING_LEVEL, MAX_LEVEL)
-                self.score += SCORE[temp] * self.level
-                self.logic_timer.modifier = (KILLER_MODIFIER ** (1 / MAX_LEVEL)) ** (self.level - 1)
-
-            for element in self.field.data[0]:
-                if element:
-                    self.game_over()
+                self.act("gravity")
+            if self.tick_timer.query() and self.clearing:
+                self.act("sweep")  # only recorded while rows are being cleared, otherwise it changes nothing
+            self.settle()
+
+    def steer(self):
+        # autoplay, one recorded action per bot tick: rotate into the orientation the bot picked,
+        # shift to its column and hard drop, the way Game.place does it in one go
+        if self.filled or self.clearing:
+            return  # wait for the rows being cleared to go, a piece dropped now would land on them
+        figure = self.field.figure
+        if self.plan is None or self.plan[0] != self.pieces:
+            self.plan = [self.pieces, *self.bot(self), 0]
+        pieces, x, orient, steps = self.plan
+        self.plan[3] += 1
+
+        if figure.orient != orient % len(figure.data) and steps < len(figure.data):
+            self.act("rotate")
+        elif figure.pos[0] != x and steps < len(figure.data) + self.field.cols:
+            self.act("move right" if x > figure.pos[0] else "move left")
+        else:
+            self.act("place")
+
+    def settle(self):
+        count, sound = Game.settle(self)
+        if sound:
+            Mixer.effect("clear")
+
+        # progress
+        if count:
+            self.logic_timer.modifier = self.modifier
+        return count, sound
+
+    def changed(self, layer, key) -> bool:
+        if layer in self.layers and self.layers[layer] == key:
+            return False
+        self.layers[layer] = key
+        return True
 
     def render(self):
-        self.display.fill(self.graphics['hud'])
-        pygame.draw.rect(self.display, self.graphics["widget"], self.header)
-
-        self.field.render(self.display)
-        self.next.render(self.display)
-        self.exit_button.render(self.display)
-        self.keys_button.render(self.display)
-        self.shadow_switch.render(self.display)
-        self.music_switch.render(self.display)
-        self.sound_switch.render(self.display)
-        self.theme_switch.render(self.display)
-
+        # retained mode: a layer is only redrawn (and pushed to the screen) when its key changes
+        full = self.changed("frame", (self.graphics.theme, self.key_tooltip.active, self.profiling))
+        if full:
+            self.layers = {"frame": self.layers["frame"]}
+            if self.hud_theme != self.graphics.theme:
+                self.hud, self.hud_theme = self.render_hud(), self.graphics.theme
+            self.display.blit(self.hud, (0, 0))
+
+        dirty = self.dirty
+        dirty.clear()
+        figure = self.field.figure
+        if self.profiling:
+            self.layers.pop("field", None)  # the overlay sits on the field, so the field is redrawn under it
+        if self.changed("field", (
+                self.field.version, figure.figure, figure.orient, *figure.pos,
+                self.shadow_switch.state, self.running[1], self.running[2]
+        )):
+            self.field.render(self.display)
+            self.render_label()
+            dirty.append(self.field.rect)
+        self.profiler.lap("field")
+
+        if self.changed("next", self.next_figure):
+            self.display.blit(self.hud, DIM["next_area"], DIM["next_area"])
+            self.next.render(self.display)
+            dirty.append(pygame.Rect(DIM["next_area"]))
+
+        if self.changed("score", self.score):
+            self.display.blit(self.hud, DIM["score_area"], DIM["score_area"])
+            self.write(str(self.score), self.graphics["text_1"], DIM["score"] + vec(0, TILE), self.display, True)
+            dirty.append(pygame.Rect(DIM["score_area"]))
+
+        if self.changed("level", self.level):
+            self.display.blit(self.hud, DIM["level_area"], DIM["level_area"])
+            self.write(str(self.level), self.graphics["text_1"], DIM["level"] + vec(0, TILE), self.display, True)
+            dirty.append(pygame.Rect(DIM["level_area"]))
+
+        for widget in self.widgets:
+            if self.changed(id(widget), widget.look):
+                widget.render(self.display)
+                dirty.append(widget)
+
+        if self.key_tooltip.active and self.key_tooltip.rect.collidelist(dirty) != -1:
+            dirty.append(self.key_tooltip.rect)
+        if full or dirty:
+            self.key_tooltip.render(self.display)
+        if self.profiling:
+            self.render_profile()
+        self.profiler.lap("hud")
+
+        if full:
+            pygame.display.flip()
+        elif dirty:
+            pygame.display.update(dirty)
+        self.profiler.lap("flip")
+
+    def render_hud(self):
+        # everything that only changes with the theme: background, header, captions and switch labels
+        hud = pygame.Surface(DIM["screen"]).convert()
+        hud.fill(self.graphics['hud'])
+        pygame.draw.rect(hud, self.graphics["widget"], self.header)
         text, rect = self.write(self.TITLE, self.graphics["text_2"])
-        self.display.blit(text, DIM["header_text"])
-
-        self.write("Next figure", self.graphics["text_2"], DIM["next_label"], self.display)
-        self.write("Score", self.graphics["text_2"], DIM["score"], self.display)
-        self.write(str(self.score), self.graphics["text_1"], DIM["score"] + vec(0, TILE), self.display, True)
+        hud.blit(text, DIM["header_text"])
 
-        self.write("Level", self.graphics["text_2"], DIM["level"], self.display)
-        self.write(str(self.level), self.graphics["text_1"], DIM["level"] + vec(0, TILE), self.display, True)
+        self.write("Next figure", self.graphics["text_2"], DIM["next_label"], hud)
+        self.write("Score", self.graphics["text_2"], DIM["score"], hud)
+        self.write("Level", self.graphics["text_2"], DIM["level"], hud)
+        for switch in self.switches:
+            switch.render_label(hud)
+        return hud
 
+    def render_label(self):
         if self.running[2]:
             self.display.blit(self.background_shade, (DIM["field"][0], DIM["field"][1]))
             gameo_label = f'press "{str(parser.get("KEYS", "reset"))}"'
@@ -195,26 +298,83 @@ class Engine:
             self.write(pause_label, self.graphics["text_2"], DIM["label"] + vec(0, TILE * 1.5), self.display)
             self.write("to continue", self.graphics["text_2"], DIM["label"] + vec(0, TILE * 2.5), self.display)
 
-        self.key_tooltip.render(self.display)
-
-        pygame.display.flip()
+    def render_profile(self):
+        # frame and work time percentiles, refreshed a few times a second, over a sparkline of the
+        # work done in each of the last frames against the frame budget
+        x, y, width, height = DIM["profile"]
+        if self.profile_panel is None or self.profiler.count % 15 == 0:
+            stats = self.profiler.stats()
+            self.profile_panel = pygame.Surface((width, height))
+            self.profile_panel.fill(self.graphics["widget"])
+            self.profile_panel.set_alpha(220)
+            lines = (
+                f"frame {stats['frame']['p50']:.1f} / {stats['frame']['p99']:.1f} ms",
+                f"work {stats['work']['p50']:.1f} / {stats['work']['p99']:.1f} ms",
+                f"timers {stats['fires']:.1f} / frame",
+            )
+            for i, line in enumerate(lines):
+                pos = (GAP * 2, GAP + i * TILE)
+                self.write(line, self.graphics["text_2"], pos, self.profile_panel, align="topleft")
+        self.display.blit(self.profile_panel, (x, y))
+
+        bottom, budget = y + height - GAP * 2, 1 / FPS
+        points = [(x + GAP * 2 + i * 4, bottom - min(value / budget, 1) * TILE * 1.2)
+                  for i, value in enumerate(self.profiler.work((width - GAP * 4) // 4))]
+        if len(points) > 1:
+            pygame.draw.lines(self.display, self.graphics["text_3"], False, points)
+
+    def dump_profile(self):
+        os.makedirs(PATH["profiles"], exist_ok=True)
+        self.profiler.dump(os.path.join(PATH["profiles"], f"{time.strftime('%Y%m%d-%H%M%S')}.json"))
+
+    @property
+    def idle(self) -> bool:
+        # nothing can change without input: paused, game over or unfocused, and no key or button held
+        if not any(self.running[1:]) and pygame.key.get_focused():
+            return False
+        return not any(self.event_handler.hold) and not any(key.holded for key in self.event_handler.keys.values())
+
+    def wait(self):
+        timeout = IDLE_TIMEOUT
+        deadline = self.clock.next_deadline()
+        if deadline is not None:
+            timeout = max(0, min(timeout, int(self.clock.ms(deadline - self.clock.now))))
+
+        event = pygame.event.wait(timeout)
+        if event.type != pygame.NOEVENT:
+            pygame.event.post(event)
 
     def loop(self):
         self.running[0] = True
+        profiler = self.profiler
         while self.running[0]:
-            self.dt = self.clock.tick(FPS) / 1000
-            self.events()
-            self.logic()
+            profiler.begin(self.clock.fires)
+            if self.idle:
+                self.wait()
+            self.dt = self.clock.tick(FPS)
+            profiler.lap("tick")
+            for _ in range(self.clock.steps()):
+                self.clock.step()
+                self.events()
+                profiler.lap("events")
+                self.logic()
+                profiler.lap("logic")
             self.render()
+            if self.recorder is not None:
+                self.recorder.flush()
+            profiler.end(self.clock.fires)
+        if self.recorder is not None:
+            self.recorder.close()
 
     @Mixer.play("fail")
     def game_over(self):
-        Mixer.theme.stop()
+        Game.game_over(self)
+        Mixer.stop_theme()
         self.running[2] = True
 
     @staticmethod
     def write(text, color, pos=(0, 0), canvas=None, large=False, align="center"):
-        surface = FONT[large].render(text, False, color)
+        surface = Engine.TEXT(text, color, large)
         rect = surface.get_rect()
         setattr(rect, align, pos)
         if canvas is not None:
@@ -222,6 +382,8 @@ class Engine:
         return surface, rect
 
     def drag_window(self):
+        if windll is None or self.window_handle is None:
+            return
         pos = wintypes.POINT()
         windll.user32.GetCursorPos(pointer(pos))
 
@@ -232,6 +394,48 @@ class Engine:
         windll.user32.MoveWindow(self.window_handle, x, y, *DIM["screen"], True)
 
 
+class ReplayEngine(Engine):
+    # frame-exact playback: one recorded frame per rendered frame, paced by the recorded ticks
+    recording = False
+
+    def __init__(self, path):
+        self.replay_seed, records, self.tick_rate = load(path)
+        self.frames = frames(records)
+        self.frame = next(self.frames, None)
+        self.start = None
+        super().__init__()
+        self.running[1] = False
+
+    def reset(self, seed=None):
+        Engine.reset(self, self.replay_seed)
+
+    @property
+    def idle(self) -> bool:
+        # playback goes on without focus; only a pause or the end of the replay leaves it waiting
+        if not any(self.running[1:]) and self.frame is not None:
+            return False
+        return Engine.idle.fget(self)
+
+    def events(self):
+        self.event_handler.update()
+        if self.event_handler['exit'] or self.event_handler['exit', 'press']:
+            self.running[0] = False
+        if self.event_handler['pause', 'press']:
+            self.running[1] = not self.running[1]
+
+    def logic(self):
+        if any(self.running[1:]) or self.frame is None:
+            return
+        if self.start is None:
+            self.start = self.clock.now - self.frame[0][0]
+        if self.frame[0][0] <= self.clock.now - self.start:
+            for tick, action in self.frame:
+                self.act(action)
+            if not self.running[2]:
+                self.settle()
+            self.frame = next(self.frames, None)
+
+
 if __name__ == '__main__':
     pygame.init()
     engine = Engine()
@@ -10,8 +10,8 @@ class Key:
         self.pressed = False
         self.holded = False
         self.statemark = 0
-        self.repeat = repeat[0]
-        self.signal = clock.timer(repeat[1], periodic=True)
+        self.repeat = clock.duration(repeat[0])
+        self.signal = clock.timer(repeat[1], periodic=True, running=False)
 
     def __getitem__(self, mode):
         if mode == 'press':
@@ -23,6 +23,7 @@ class Key:
         if hold[self.key] - self.holded == 1:
             self.pressed = True
             self.statemark = now
+            self.signal.reset()
         elif hold[self.key]:
             if now - self.repeat > self.statemark:
                 self.pressed = self.signal.query()
@@ -30,6 +31,8 @@ class Key:
                 self.pressed = False
         else:
             self.pressed = False
+            if self.holded:
+                self.signal.stop()
 
         self.holded = hold[self.key]
 
@@ -60,17 +63,20 @@ class EventHandler:
         hold = pygame.key.get_pressed()
         self.now = self.clock.now
 
-        self.focus = vec(pygame.mouse.get_pos())
+        # the vectors and button lists are updated in place, so a frame without input allocates nothing
+        self.focus.update(pygame.mouse.get_pos())
         self.hold = pygame.mouse.get_pressed()
 
         if not self.hold[0]:
-            self.drag[0] = vec(self.focus)
-        self.drag[1] = vec(self.focus)
+            self.drag[0].update(self.focus)
+        self.drag[1].update(self.focus)
 
         for key in self.keys.values():
             key.update(hold, self.now)
-        self.click = [current - last == 1 for current, last in zip(self.hold, self.temp)]
-        self.temp = self.hold[:]
+        click, temp = self.click, self.temp
+        for button in range(3):
+            click[button] = self.hold[button] - temp[button] == 1
+            temp[button] = self.hold[button]
 
     def __getitem__(self, key_mode):
         if key_mode == 'exit':
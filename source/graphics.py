@@ -1,20 +1,35 @@
+from collections import OrderedDict
+
 import pygame
 from settings import FIGURE_NAMES, TILE, GAP, THEMES, DATA
 
+KEY = (255, 0, 255)  # the atlas' transparent colour, in no palette
+
 
 class Graphics:
 
     FIGURES = FIGURE_NAMES + ("X", "#")
+    TILES = FIGURES + ("shadow",)
 
     def __init__(self, engine):
         self.engine = engine
-        self._data = DATA["colors"].copy()
+        self._data = {theme: dict(colors) for theme, colors in DATA["colors"].items()}
+
+        # every tile of a theme side by side on one opaque, colour keyed surface; a tile is drawn
+        # by blitting its area, so a layer goes out as one Surface.blits batch
+        self.areas = {tile: pygame.Rect(i * TILE, 0, TILE, TILE) for i, tile in enumerate(self.TILES)}
+        self.atlases = {theme: self.build_atlas(theme) for theme in THEMES}
 
-        for theme in THEMES:
-            for figure in self.FIGURES:
-                image = pygame.Surface((TILE, TILE), pygame.SRCALPHA, 32).convert_alpha()
-                pygame.draw.rect(image, self._data[theme][figure], (GAP, GAP, TILE - GAP * 2, TILE - GAP * 2))
-                self._data[theme][figure] = image
+    def build_atlas(self, theme):
+        atlas = pygame.Surface((TILE * len(self.TILES), TILE))
+        atlas.fill(KEY)
+        for figure in self.FIGURES:
+            pygame.draw.rect(atlas, self._data[theme][figure], self.areas[figure].inflate(-GAP * 2, -GAP * 2))
+        pygame.draw.rect(atlas, self._data[theme]["shadow"], self.areas["shadow"].inflate(-GAP * 2, -GAP * 2), 2)
+        if pygame.display.get_surface() is not None:
+            atlas = atlas.convert()
+        atlas.set_colorkey(KEY, pygame.RLEACCEL)
+        return atlas
 
     def __getitem__(self, key):
         return self._data[self.theme][key]
@@ -22,3 +37,35 @@ class Graphics:
     @property
     def theme(self):
         return THEMES[self.engine.theme_switch.state]
+
+    @property
+    def atlas(self):
+        return self.atlases[self.theme]
+
+    def tile(self, tile, pos):
+        # a blits entry drawing one tile at pos
+        return self.atlas, pos, self.areas[tile]
+
+
+class TextCache:
+
+    def __init__(self, load, capacity=256):
+        self.load = load  # returns the (normal, large) fonts; called on the first render
+        self.fonts = None
+        self.capacity = capacity
+        self.surfaces = OrderedDict()
+
+    def __call__(self, text, color, large=False):
+        # colours come from the theme palettes, so the colour also keys the theme
+        key = text, tuple(color), large
+        surface = self.surfaces.get(key)
+        if surface is None:
+            if self.fonts is None:
+                self.fonts = self.load()
+            surface = self.fonts[large].render(text, False, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.capacity:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
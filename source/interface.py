@@ -9,6 +9,7 @@ class Widget(pygame.Rect):
         self.engine = engine
         self.event_handler = event_handler
         self.surface = pygame.Surface(self.size, pygame.SRCALPHA, 32).convert_alpha()
+        self.images = {}  # (theme, look) -> the finished image, drawn the first time it is shown
 
     @property
     def focused(self):
@@ -20,6 +21,18 @@ class Widget(pygame.Rect):
 
     @property
     def image(self):
+        key = self.engine.graphics.theme, self.look
+        image = self.images.get(key)
+        if image is None:
+            image = self.images[key] = self.draw()
+        return image
+
+    @property
+    def look(self):
+        # everything the image depends on besides the theme
+        return None
+
+    def draw(self):
         return self.surface
 
     def render(self, display):
@@ -32,15 +45,19 @@ class Button(Widget):
         super().__init__(engine, event_handler, dim)
         self.color_key = color_key
 
-    @property
-    def image(self):
-        self.surface.fill(self.engine.graphics["widget"])
+    def draw(self):
+        surface = pygame.Surface(self.size).convert()
+        surface.fill(self.engine.graphics["widget"])
         dim = (GAP * 2, GAP * 2, self.width - GAP * 4, self.height - GAP * 4)
         if self.focused:
-            pygame.draw.rect(self.surface, self.engine.graphics[self.color_key], dim)
+            pygame.draw.rect(surface, self.engine.graphics[self.color_key], dim)
         else:
-            pygame.draw.rect(self.surface, self.engine.graphics["text_2"], dim)
-        return self.surface
+            pygame.draw.rect(surface, self.engine.graphics["text_2"], dim)
+        return surface
+
+    @property
+    def look(self):
+        return self.focused
 
 
 class Switch(Widget):
@@ -54,12 +71,11 @@ class Switch(Widget):
         self.label = label
         self.label_pos = pos + vec(self.width // 2, -GAP)
 
-    @property
-    def image(self):
-
-        self.surface.fill(self.engine.graphics["widget"])
+    def draw(self):
+        surface = pygame.Surface(self.size).convert()
+        surface.fill(self.engine.graphics["widget"])
         pygame.draw.rect(
-            self.surface, self.engine.graphics["field"],
+            surface, self.engine.graphics["field"],
             (TILE // 2 - GAP * 2, GAP * 2, GAP * 4, TILE - GAP * 4)
         )
 
@@ -68,26 +84,26 @@ class Switch(Widget):
         else:
             text, color, dim = "Off", "text_2", (GAP * 2, GAP * 2, TILE - GAP * 4, GAP * 4)
 
-        pygame.draw.rect(self.surface, self.engine.graphics[color], dim)
-        self.engine.write(text, self.engine.graphics[color], (TILE * 1.5, TILE * 0.6), self.surface)
+        pygame.draw.rect(surface, self.engine.graphics[color], dim)
+        self.engine.write(text, self.engine.graphics[color], (TILE * 1.5, TILE * 0.6), surface)
 
-        return self.surface
+        return surface
+
+    @property
+    def look(self):
+        return self.state
 
     def flip(self):
         self.state = not self.state
 
-    def render(self, display):
+    def update(self):
         self.last_state = self.state
         if self.clicked:
             self.state = not self.state
 
-        super().render(display)
-
+    def render_label(self, surface):
         if self.label:
-            self.engine.write(
-                self.label, self.engine.graphics["text_2"],
-                self.label_pos, self.engine.display, align="midbottom"
-            )
+            self.engine.write(self.label, self.engine.graphics["text_2"], self.label_pos, surface, align="midbottom")
 
 
 class KeyTooltip:
@@ -0,0 +1,77 @@
+import json
+import time
+from array import array
+
+PHASES = ("tick", "events", "logic", "field", "hud", "flip")
+WORK = PHASES[1:]  # everything but the time spent sleeping in Clock.tick / waiting for events
+SIZE = 600
+
+
+def percentile(values, point) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, len(ordered) * point // 100)] if ordered else 0
+
+
+class Profiler:
+    # per-phase durations of the last SIZE frames in preallocated arrays, written in place
+    # as a ring so recording a frame allocates nothing
+
+    def __init__(self, size=SIZE, phases=PHASES):
+        self.size = size
+        self.phases = phases
+        self.samples = {phase: array('d', bytes(8 * size)) for phase in phases}
+        self.frames = array('d', bytes(8 * size))
+        self.fires = array('q', bytes(8 * size))
+        self.index = 0
+        self.count = 0
+        self.start = self.last = time.perf_counter()
+        self.fired = 0
+
+    def begin(self, fired=0):
+        for samples in self.samples.values():
+            samples[self.index] = 0
+        self.fired = fired
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.samples[phase][self.index] += now - self.last
+        self.last = now
+
+    def end(self, fired=0):
+        self.frames[self.index] = self.last - self.start
+        self.fires[self.index] = fired - self.fired
+        self.index = (self.index + 1) % self.size
+        self.count += 1
+
+    def recent(self, values, count=None) -> list:
+        # the last count entries of one of the ring arrays, oldest first
+        count = min(self.count, self.size, count or self.size)
+        return [values[(self.index - count + i) % self.size] for i in range(count)]
+
+    def work(self, count=None) -> list:
+        columns = [self.recent(self.samples[phase], count) for phase in WORK if phase in self.samples]
+        return [sum(frame) for frame in zip(*columns)]
+
+    def stats(self) -> dict:
+        def summary(values):
+            return {f"p{point}": round(percentile(values, point) * 1000, 3) for point in (50, 90, 99)}
+
+        result = {phase: summary(self.recent(samples)) for phase, samples in self.samples.items()}
+        result["frame"] = summary(self.recent(self.frames))
+        result["work"] = summary(self.work())
+        fires = self.recent(self.fires)
+        result["fires"] = sum(fires) / len(fires) if fires else 0
+        return result
+
+    def dump(self, path):
+        # the whole buffer, oldest frame first, durations in milliseconds
+        data = {
+            "frames": [value * 1000 for value in self.recent(self.frames)],
+            "phases": {phase: [value * 1000 for value in self.recent(samples)]
+                       for phase, samples in self.samples.items()},
+            "fires": list(self.recent(self.fires)),
+            "stats": self.stats(),
+        }
+        with open(path, 'w') as file:
+            json.dump(data, file)
@@ -0,0 +1,120 @@
+import argparse
+import os
+import time
+
+from codec import varint, read_varint
+from config import PATH
+from rules import Game
+
+MAGIC = b"TRP"
+VERSION = 2
+ACTIONS = ("rotate cw", "rotate ccw", "rotate", "move left", "move right", "move down", "place", "gravity", "sweep")
+
+# file layout: MAGIC, version byte, varint tick rate (0: milliseconds), varint seed, varint first tick,
+# then one varint per action: (tick delta since the previous action << 4) | action index
+
+
+class Recorder:
+
+    def __init__(self, path, seed, tick=0, rate=None):
+        self.path = path
+        self.tick = tick
+        self.buffer = bytearray(MAGIC + bytes((VERSION,)) + varint(rate or 0) + varint(seed) + varint(tick))
+        self.file = open(path, 'ab')
+
+    @classmethod
+    def create(cls, seed, tick=0, rate=None):
+        os.makedirs(PATH["replays"], exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{seed}.trp"
+        return cls(os.path.join(PATH["replays"], name), seed, tick, rate)
+
+    def record(self, tick, action):
+        self.buffer += varint((tick - self.tick) << 4 | ACTIONS.index(action))
+        self.tick = tick
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.file.flush()
+            self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def load(path) -> (int, list, int):
+    with open(path, 'rb') as file:
+        data = file.read()
+    if data[:len(MAGIC)] != MAGIC or data[len(MAGIC)] not in (1, VERSION):
+        raise ValueError(f"{path} is not a version {VERSION} replay")
+
+    rate, pos = 0, len(MAGIC) + 1
+    if data[len(MAGIC)] >= 2:
+        rate, pos = read_varint(data, pos)
+    seed, pos = read_varint(data, pos)
+    tick, pos = read_varint(data, pos)
+    records = []
+    while pos < len(data):
+        try:
+            value, pos = read_varint(data, pos)
+        except EOFError:
+            break  # the game was cut off mid-write
+        tick += value >> 4
+        records.append((tick, ACTIONS[value & 0xf]))
+    return seed, records, rate or None
+
+
+def frames(records):
+    # actions sharing a tick were applied in the same Engine frame
+    frame = []
+    for record in records:
+        if frame and record[0] != frame[0][0]:
+            yield frame
+            frame = []
+        frame.append(record)
+    if frame:
+        yield frame
+
+
+def simulate(seed, records) -> Game:
+    game = Game(seed)
+    game.deferred_clear = True
+    for frame in frames(records):
+        if game.over:
+            break
+        for tick, action in frame:
+            game.act(action)
+        if not game.over:
+            game.settle()
+    return game
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-simulate recorded games.")
+    parser.add_argument("replays", nargs="+")
+    parser.add_argument("--visual", action="store_true", help="play back frame by frame in a window")
+    args = parser.parse_args(argv)
+
+    if args.visual:
+        import pygame
+        from engine import ReplayEngine
+
+        pygame.init()
+        for path in args.replays:
+            ReplayEngine(path).loop()
+        pygame.quit()
+        return
+
+    for path in args.replays:
+        start = time.perf_counter()
+        seed, records, rate = load(path)
+        game = simulate(seed, records)
+        duration = (records[-1][0] - records[0][0]) / (rate or 1000) if records else 0
+        elapsed = time.perf_counter() - start
+        print(f"{path}: score {game.score}, lines {game.lines}, level {game.level}, pieces {game.pieces}, "
+              f"{duration:.0f}s of play in {elapsed * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
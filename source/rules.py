@@ -0,0 +1,492 @@
+import random
+from array import array
+from collections import deque, namedtuple
+
+from config import FIGURE_DATA, FIGURE_NAMES, FIELD, SCORE, STARTING_LEVEL, MAX_LEVEL, KILLER_MODIFIER, NEW_DELAY
+
+
+Orientation = namedtuple("Orientation", "cells left top right bottom kicks floor")
+
+
+def compile_figure(shape, orients):
+    # kicks: x offsets tried when the rotated figure would stick out of the left / right wall
+    # floor: (dx, lowest dy) per column of the figure, the cells that meet the stack when it drops
+    kicks = (2 if shape == "I" else 1, -1)
+    table = []
+    for cells in orients:
+        cells = tuple((x, y) for x, y in cells)
+        xs, ys = [x for x, _ in cells], [y for _, y in cells]
+        floor = tuple((dx, max(y for x, y in cells if x == dx)) for dx in sorted(set(xs)))
+        table.append(Orientation(cells, min(xs), min(ys), max(xs), max(ys), kicks, floor))
+    return tuple(table)
+
+
+SHAPES = {shape: compile_figure(shape, orients) for shape, orients in FIGURE_DATA.items()}
+
+
+def zobrist_table(cols, rows, seed=0x7e7) -> tuple:
+    # one random 64 bit key per cell; a board's key is the xor of the keys of its filled cells
+    keys = random.Random(seed)
+    return tuple(tuple(keys.getrandbits(64) for _ in range(cols)) for __ in range(rows))
+
+
+ZOBRIST = zobrist_table(*FIELD)
+
+
+class Matrix:
+
+    def __init__(self, cols, rows):
+        self.cols = cols
+        self.rows = rows
+        self.data = [[0 for _ in range(cols)] for __ in range(rows)]
+        self.index = [0, 0]
+        self.version = 0
+        self.journal = None  # set to a list to have every change appended to it, see delta.py
+
+    def __getitem__(self, index: (int, int)) -> int:
+        x, y = index
+        return self.data[int(y)][int(x)]
+
+    def __setitem__(self, index: (int, int), item):
+        x, y = index
+        self.data[int(y)][int(x)] = item
+        self.version += 1
+        if self.journal is not None:
+            self.journal.append(("set", int(x), int(y), item))
+
+    def __iter__(self):
+        self.index = [0, 0]
+        return self
+
+    def __next__(self) -> (int, int, str):
+        x, y = self.index
+        if y >= self.rows:
+            raise StopIteration
+        self.index[0] += 1
+        if self.index[0] >= self.cols:
+            self.index[0] = 0
+            self.index[1] += 1
+        return x, y, self.data[y][x]
+
+    def set_row(self, row, item):
+        self.data[row] = [item for _ in range(self.cols)]
+        self.version += 1
+        if self.journal is not None:
+            self.journal.append(("set row", row, item))
+
+    def del_row(self, row):
+        del self.data[row]
+        self.data.insert(0, [0 for _ in range(self.cols)])
+        self.version += 1
+        if self.journal is not None:
+            self.journal.append(("del row", row))
+
+
+class Board(Matrix):
+
+    def __init__(self, engine, dim, _next):
+        Matrix.__init__(self, *dim[-2:])
+        self.engine = engine
+        self.tops = [0] * self.cols  # per column: height of the highest filled cell above the floor
+        self.gaps = [0] * self.cols  # per column: empty cells below that one
+        self.zobrist = 0  # xor of ZOBRIST over the filled cells, kept up to date on every change
+        self.landings = {}  # (shape, orient, x) -> pos y of a drop from above the stack, at self.landed
+        self.landed = self.version
+        self.figure = Figure(self)
+        self.figure.reset(_next)
+
+    def __setitem__(self, index, item):
+        x, y = int(index[0]), int(index[1])
+        if bool(self.data[y][x]) != bool(item):
+            self.zobrist ^= ZOBRIST[y][x]
+        Matrix.__setitem__(self, index, item)
+        self.survey(x)
+
+    def set_row(self, row, item):
+        for x, cell in enumerate(self.data[row]):
+            if bool(cell) != bool(item):
+                self.zobrist ^= ZOBRIST[row][x]
+        Matrix.set_row(self, row, item)
+        for x in range(self.cols):
+            self.survey(x)
+
+    def del_row(self, row):
+        cells = self.data[row]
+        for x, cell in enumerate(cells):
+            if cell:
+                self.zobrist ^= ZOBRIST[row][x]
+        for y in range(row):
+            for x, cell in enumerate(self.data[y]):
+                if cell:
+                    self.zobrist ^= ZOBRIST[y][x] ^ ZOBRIST[y + 1][x]
+        Matrix.del_row(self, row)
+        for x, cell in enumerate(cells):
+            top = self.rows - self.tops[x]
+            if row == top:
+                self.survey(x)
+            elif row > top:
+                self.tops[x] -= 1
+                if not cell:
+                    self.gaps[x] -= 1
+
+    def survey(self, x):
+        column = [row[x] for row in self.data]
+        top = next((y for y, cell in enumerate(column) if cell), self.rows)
+        self.tops[x] = self.rows - top
+        self.gaps[x] = column[top:].count(0)
+
+    @property
+    def holes(self) -> int:
+        return sum(self.gaps)
+
+    def collide(self, figure, orient, x, y) -> bool:
+        data, cols, rows = self.data, self.cols, self.rows
+        for dx, dy in SHAPES[figure][orient].cells:
+            if not 0 <= x + dx < cols or y + dy >= rows or data[y + dy][x + dx]:
+                return True
+        return False
+
+    def turn(self, figure, orient, x, y, direction):
+        table = SHAPES[figure]
+        orient = (orient + direction) % len(table)
+        target = table[orient]
+        if y == 0:
+            y = 1
+        if x + target.left < 0:
+            x += target.kicks[0]
+        elif x + target.right >= self.cols:
+            x += target.kicks[1]
+        return orient, x, y
+
+    def rotation(self, figure, orient, x, y, direction):
+        orient, x, y = self.turn(figure, orient, x, y, direction)
+        if self.collide(figure, orient, x, y):
+            return None
+        return orient, x, y
+
+    def placements(self, tuck=False) -> array:
+        # every resting place of the current figure reachable by shifts and rotations, followed by a
+        # hard drop (or, with tuck, by soft drops too), as a flat array of (x, orient, y) triples
+        figure = self.figure
+        shape, collide, free = figure.figure, self.collide, {}
+
+        def fits(state):
+            if state not in free:
+                free[state] = not collide(shape, *state)
+            return free[state]
+
+        start = (figure.orient, figure.pos[0], figure.pos[1])
+        if not fits(start):
+            return array('b')
+
+        seen, queue, landed, result = {start}, deque([start]), set(), array('b')
+        while queue:
+            orient, x, y = queue.popleft()
+            moves = [(orient, x - 1, y), (orient, x + 1, y),
+                     self.turn(shape, orient, x, y, 1), self.turn(shape, orient, x, y, -1)]
+            if tuck:
+                moves.append((orient, x, y + 1))
+            for state in moves:
+                if state not in seen and fits(state):
+                    seen.add(state)
+                    queue.append(state)
+
+            if not tuck:
+                while fits((orient, x, y + 1)):
+                    y += 1
+            elif fits((orient, x, y + 1)):
+                continue
+            if (x, orient, y) not in landed:
+                landed.add((x, orient, y))
+                result.extend((x, orient, y))
+        return result
+
+    def collide_figure(self, sides=True, pos=0):
+        data, cols, rows = self.data, self.cols, self.rows
+        for x, y in self.figure:
+            if sides and x < 0:
+                return 2
+            if sides and x >= cols:
+                return 3
+            y += pos
+            if y >= rows or data[y][x]:
+                return 1
+        return 0
+
+    def drop_figure(self, merge=False):
+        if not self.collide_figure(False, 1):
+            self.figure.pos[1] += 1
+        elif merge:
+            self.merge_figure()
+
+    def move_figure(self, vector):
+        dx, dy = vector
+        pos = self.figure.pos
+        pos[0] += dx
+        pos[1] += dy
+        if self.collide_figure():
+            pos[0] -= dx
+            pos[1] -= dy
+            return False
+        else:
+            return True
+
+    def rotate_figure(self, direction) -> bool:
+        figure = self.figure
+        result = self.rotation(figure.figure, figure.orient, figure.pos[0], figure.pos[1], direction)
+        if result is None:
+            return False
+        figure.orient, figure.pos[0], figure.pos[1] = result
+        return True
+
+    def place_figure(self):
+        self.figure.pos[1] += self.height()
+        self.merge_figure()
+
+    def merge_figure(self):
+        figure, tops, gaps = self.figure, self.tops, self.gaps
+        for x, y in figure:
+            self.data[y][x] = figure.figure
+            self.zobrist ^= ZOBRIST[y][x]
+            top = self.rows - tops[x]
+            if y < top:
+                gaps[x] += top - y - 1
+                tops[x] = self.rows - y
+            else:
+                gaps[x] -= 1  # tucked under an overhang into a hole
+        full = sorted({y for x, y in figure if 0 not in self.data[y]})  # the rows this piece completed
+        self.version += 1
+        if self.journal is not None:
+            self.journal.append(("merge", figure.figure, figure.orient, *figure.pos))
+        self.engine.merged(full)
+        self.figure.reset(self.engine.next_figure)
+
+        if self.collide_figure() == 1 and not self.engine.over:
+            self.engine.game_over()
+        if self.collide_figure() == 2:
+            self.move_figure(((1, 2)[self.figure.figure == "I"], 0))
+        if self.collide_figure() == 3:
+            self.move_figure((-1, 0))
+
+        self.engine.delay(NEW_DELAY)
+        self.engine.next_figure = self.engine.next()
+
+    def full_rows(self):
+        return [i for i, row in enumerate(self.data) if 0 not in row]
+
+    def landing(self, shape, orient, x) -> int:
+        # where a figure dropped straight down from above the stack comes to rest, from the column
+        # heights alone; remembered until the board changes
+        if self.landed != self.version:
+            self.landings.clear()
+            self.landed = self.version
+        key = shape, orient, x
+        y = self.landings.get(key)
+        if y is None:
+            tops, rows = self.tops, self.rows
+            y = min(rows - tops[x + dx] - 1 - dy for dx, dy in SHAPES[shape][orient].floor)
+            self.landings[key] = y
+        return y
+
+    def height(self, distance=0):
+        # a figure above the stack in all of its columns falls to its landing; one tucked under an
+        # overhang has to be walked down
+        figure = self.figure
+        x, y = figure.pos
+        if not distance:
+            landing = self.landing(figure.figure, figure.orient, x)
+            if y <= landing:
+                return landing - y
+        return self.probe(distance)
+
+    def probe(self, distance=0):
+        # the shortest free run under any cell of the figure, walking the figure once
+        data, rows = self.data, self.rows
+        lowest = rows
+        for x, y in self.figure:
+            free = distance
+            while free < lowest and y + free < rows and not data[y + free][x]:
+                free += 1
+            lowest = min(lowest, free)
+        return lowest - 1
+
+
+class Figure:
+
+    def __init__(self, engine):
+        self.data = None
+        self.figure = None
+        self.engine = engine
+        self.orient = 0
+        self.pos = [5, 0]
+        self.cells = ()
+        self.placed = [None, 0, 0]  # orient and pos the cells were built for
+
+    def __getitem__(self, index):
+        return self.data[self.orient][index]
+
+    def __iter__(self):
+        # absolute cells, rebuilt only after the figure has moved or turned
+        placed, (x, y) = self.placed, self.pos
+        if placed[0] != self.orient or placed[1] != x or placed[2] != y:
+            self.cells = tuple((dx + x, dy + y) for dx, dy in self.data[self.orient])
+            placed[0], placed[1], placed[2] = self.orient, x, y
+        return iter(self.cells)
+
+    def reset(self, shape):
+        self.pos = [5, 0]
+        self.orient = 0
+        self.data = FIGURE_DATA[shape][:]
+        self.figure = shape
+        self.placed[0] = None
+
+
+class Bag:
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+        self.container = list(FIGURE_NAMES[:])
+
+    def __call__(self):
+        figure = self.random.choice(self.container)
+        self.container.remove(figure)
+        if not self.container:
+            self.container = list(FIGURE_NAMES[:])
+        return figure
+
+
+class Game:
+    # headless rules; Engine subclasses it and swaps in its drawable Next / Field via the hooks below
+
+    deferred_clear = False
+    board = Board
+
+    def __init__(self, seed=None, board=None):
+        if board is not None:
+            self.board = board
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.next = self.new_next(self.seed)
+        self.field = self.new_field(self.next())
+        self.next_figure = self.next()
+
+        self.over = False
+        self.topped = False  # something sits in the top row
+        self.filled = []  # rows completed since the last settle, top first
+        self.clearing = []  # rows marked 'X' and being swept, top first
+        self.pieces = 0
+        self.lines = 0
+        self.score = 0
+        self.level = min(self.lines // 10 + STARTING_LEVEL, MAX_LEVEL)
+
+    def new_next(self, seed):
+        return Bag(seed)
+
+    def new_field(self, figure):
+        return self.board(self, FIELD, figure)
+
+    @property
+    def modifier(self) -> float:
+        return (KILLER_MODIFIER ** (1 / MAX_LEVEL)) ** (self.level - 1)
+
+    def add_lines(self, count):
+        self.lines += count
+        self.level = min(self.lines // 10 + STARTING_LEVEL, MAX_LEVEL)
+        self.score += SCORE[count] * self.level
+
+    def clear_lines(self, rows=None) -> int:
+        # rows: the full rows top first, when the caller already knows them
+        if rows is None:
+            rows = self.field.full_rows()
+        for row in rows:
+            self.field.del_row(row)
+        if rows:
+            self.add_lines(len(rows))
+        return len(rows)
+
+    def place(self, x, orient):
+        # reach (x, orient) the way a player would, rotating first and then shifting, and hard drop
+        if self.over:
+            return
+        field = self.field
+        for _ in range(orient % len(field.figure.data)):
+            if not field.rotate_figure(1):
+                break
+        step = 1 if x > field.figure.pos[0] else -1
+        while field.figure.pos[0] != x and field.move_figure((step, 0)):
+            pass
+        field.place_figure()
+
+    def act(self, action):
+        # a finished board takes no more input; merging onto it would write above the top row
+        if self.over:
+            return
+        field = self.field
+        if action == "rotate cw":
+            field.rotate_figure(-1)
+        elif action in ("rotate ccw", "rotate"):
+            field.rotate_figure(1)
+        elif action == "move left":
+            field.move_figure((-1, 0))
+        elif action == "move right":
+            field.move_figure((1, 0))
+        elif action == "move down":
+            field.drop_figure()
+        elif action == "place":
+            field.place_figure()
+        elif action == "gravity":
+            field.drop_figure(True)
+        elif action == "sweep":
+            self.sweep()
+
+    def sweep(self):
+        data = self.field.data
+        for i in self.clearing:
+            if 'X' in data[i]:
+                self.field[data[i].index('X'), i] = '#'
+
+    def settle(self) -> (int, bool):
+        # deferred clears: rows filled by a merge turn to 'X', get swept to '#' a tile per sweep and
+        # are removed here. Only the rows in flight are looked at, so with none this is two checks.
+        count, marked = 0, bool(self.filled)
+        if marked or self.clearing:
+            field, filled, clearing = self.field, self.filled, []
+            for i in sorted(self.clearing + filled):
+                if field.data[i].count('#') == field.cols:
+                    field.del_row(i)
+                    count += 1
+                    self.topped = False
+                    clearing = [j + 1 for j in clearing]  # the rows kept above it moved down
+                else:
+                    if i in filled:
+                        field.set_row(i, 'X')
+                    clearing.append(i)
+            filled.clear()
+            self.clearing = clearing
+
+        if count:
+            self.add_lines(count)
+        if self.topped and not self.over:
+            self.game_over()
+        return count, marked
+
+    def merged(self, rows=()):
+        # rows: the ones the merge completed, top first
+        self.pieces += 1
+        field = self.field
+        self.topped = self.topped or any(field.tops[x] == field.rows for x, y in field.figure)
+        if self.deferred_clear:
+            self.filled.extend(rows)
+        elif rows:
+            self.clear_lines(rows)
+            self.topped = False  # the top row is a fresh empty one now
+        elif self.topped and not self.over:
+            self.game_over()
+
+    def delay(self, time):
+        pass
+
+    def game_over(self):
+        self.over = True
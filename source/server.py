@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import json
+import logging
+from collections import deque
+
+from clock import Clock, MAX_STEPS
+from codec import varint
+from config import DELAY, TICK_RATE
+from delta import Stream
+from replay import ACTIONS
+from rules import Game
+
+MAGIC = b"TSV"
+VERSION = 2
+INPUTS = ACTIONS[:7]  # a client sends one byte per action: its index here
+WRITE_LIMIT = 16 * 1024  # bytes queued in the transport before drain() makes the sender wait
+MAX_PENDING = 60  # frames a waiting sender may fall behind before they are replaced by a keyframe
+STALL_TIMEOUT = 10  # seconds a client may go without reading before it is dropped
+SAMPLES = 4096
+
+log = logging.getLogger(__name__)
+
+# stream layout: MAGIC, version byte, varint tick rate, varint seed, then a delta stream (see delta.py)
+
+
+class Match(Game):
+    # one headless game on its own fixed-step clock, driven by the same timers as Engine
+    deferred_clear = True
+
+    def __init__(self, seed=None, rate=TICK_RATE or 60):
+        self.clock = Clock(rate)
+        self.logic_timer = self.clock.timer(DELAY, periodic=True)
+        self.tick_timer = self.clock.timer(30, periodic=True)
+        self.inputs = deque(maxlen=64)
+        Game.__init__(self, seed)
+        self.logic_timer.modifier = self.modifier
+
+    def delay(self, time=DELAY * 0.5):
+        self.logic_timer.delay(time)
+
+    def step(self):
+        self.clock.step()
+        if self.over:
+            return
+        while self.inputs and not self.over:
+            action = self.inputs.popleft()
+            self.act(action)
+            if action == "move down":
+                self.logic_timer.reset()
+        if self.logic_timer.query():
+            self.act("gravity")
+        if self.tick_timer.query() and self.clearing:
+            self.act("sweep")
+        count, marked = self.settle()
+        if count:
+            self.logic_timer.modifier = self.modifier
+
+    def header(self) -> bytes:
+        return MAGIC + bytes((VERSION,)) + varint(self.clock.rate) + varint(self.seed)
+
+
+class Session:
+
+    def __init__(self, match, reader, writer):
+        self.match = match
+        self.reader = reader
+        self.writer = writer
+        self.stream = Stream(match)
+        self.pending = []
+        self.dirty = asyncio.Event()
+
+    def tick(self):
+        self.match.step()
+        frame = self.stream.frame(self.match.clock.ticks)
+        if frame:
+            self.pending.append(frame)
+            if len(self.pending) > MAX_PENDING:
+                self.pending = [self.stream.keyframe(self.match.clock.ticks)]
+            self.dirty.set()
+
+    async def receive(self):
+        while True:
+            try:
+                data = await self.reader.read(256)
+            except ConnectionError:
+                break
+            if not data:
+                break
+            for code in data:
+                if code < len(INPUTS):
+                    self.match.inputs.append(INPUTS[code])
+
+    async def send(self) -> bool:
+        # a client that reads slowly makes drain() wait; the frames of the ticks that pass meanwhile
+        # are sent in one write, or swapped for a single keyframe once there are too many of them
+        self.writer.write(self.match.header() + self.stream.header())
+        while True:
+            await self.dirty.wait()
+            self.dirty.clear()
+            over = self.match.over
+            self.writer.write(b"".join(self.pending))
+            self.pending.clear()
+            try:
+                await asyncio.wait_for(self.writer.drain(), STALL_TIMEOUT)
+            except (ConnectionError, asyncio.TimeoutError):
+                return False
+            if over:
+                return True
+
+
+class Server:
+
+    def __init__(self, rate=TICK_RATE or 60):
+        self.rate = rate
+        self.sessions = set()
+        self.ticks = 0
+        self.latency = deque(maxlen=SAMPLES)
+        self.lateness = deque(maxlen=SAMPLES)
+
+    async def handle(self, reader, writer):
+        writer.transport.set_write_buffer_limits(WRITE_LIMIT)
+        session = Session(Match(rate=self.rate), reader, writer)
+        self.sessions.add(session)
+        receiver, sender = asyncio.ensure_future(session.receive()), asyncio.ensure_future(session.send())
+        try:
+            await asyncio.wait((receiver, sender), return_when=asyncio.FIRST_COMPLETED)
+            if sender.done() and sender.result() and writer.can_write_eof():
+                # half-close after the last frame: closing with unread input would reset the
+                # connection and could drop frames the client has not read yet
+                writer.write_eof()
+                await asyncio.wait_for(receiver, STALL_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.sessions.discard(session)
+            receiver.cancel()
+            sender.cancel()
+            writer.close()
+
+    async def tick(self):
+        loop = asyncio.get_event_loop()
+        period = 1 / self.rate
+        deadline = loop.time()
+        while True:
+            deadline += period
+            await asyncio.sleep(max(0, deadline - loop.time()))
+            start = loop.time()
+            if start - deadline > MAX_STEPS * period:
+                deadline = start  # too far behind to catch up; drop the missed ticks
+
+            for session in list(self.sessions):
+                try:
+                    session.tick()
+                except Exception:
+                    # one broken game must not stop the shared ticker for every other match
+                    log.exception("dropping session after a failed tick")
+                    self.sessions.discard(session)
+                    session.writer.close()
+            self.ticks += 1
+            self.lateness.append(start - deadline)
+            self.latency.append(loop.time() - start)
+
+    def metrics(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "ticks": self.ticks,
+            "rate": self.rate,
+            "tick_ms": percentiles(self.latency),
+            "late_ms": percentiles(self.lateness),
+        }
+
+    async def serve_metrics(self, reader, writer):
+        await reader.readline()
+        body = json.dumps(self.metrics()).encode()
+        writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n"
+                     b"Content-Length: %d\r\n\r\n" % len(body) + body)
+        await writer.drain()
+        writer.close()
+
+
+def percentiles(samples, points=(50, 90, 99)) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    result = {f"p{point}": round(ordered[len(ordered) * point // 100] * 1000, 3) for point in points}
+    result["max"] = round(ordered[-1] * 1000, 3)
+    return result
+
+
+async def serve(args):
+    server = Server(args.rate)
+    if args.unix:
+        games = await asyncio.start_unix_server(server.handle, args.unix)
+    else:
+        games = await asyncio.start_server(server.handle, args.host, args.port)
+    metrics = await asyncio.start_server(server.serve_metrics, args.host, args.metrics_port)
+    async with games, metrics:
+        await server.tick()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve headless games to many clients from one process.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", default=None, help="listen on a Unix socket at this path instead of TCP")
+    parser.add_argument("--metrics-port", type=int, default=7778)
+    parser.add_argument("--rate", type=int, default=TICK_RATE or 60, help="ticks per second")
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args))
+
+
+if __name__ == '__main__':
+    main()
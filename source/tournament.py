@@ -0,0 +1,80 @@
+import argparse
+import importlib
+import json
+import multiprocessing
+import random
+import sys
+import time
+from functools import partial
+
+from bitboard import BitBoard
+from config import FIELD
+from rules import Game
+
+
+def random_agent(game):
+    rng = random.Random(game.seed * 1000003 + game.pieces)
+    return rng.randrange(FIELD[0]), rng.randrange(4)
+
+
+def load_agent(name):
+    module, _, attr = name.partition(":")
+    return getattr(importlib.import_module(module), attr or "agent")
+
+
+def play(agent, seed, max_pieces=None):
+    start = time.perf_counter()
+    game = Game(seed, BitBoard)
+    while not game.over and (max_pieces is None or game.pieces < max_pieces):
+        x, orient = agent(game)
+        game.place(x, orient)
+    return {
+        "seed": seed,
+        "lines": game.lines,
+        "score": game.score,
+        "level": game.level,
+        "pieces": game.pieces,
+        "time": time.perf_counter() - start,
+    }
+
+
+def run(agent, seeds, workers=None, chunksize=None, max_pieces=None):
+    # results are yielded per game as soon as its chunk is done, in completion order
+    seeds = list(seeds)
+    workers = workers or multiprocessing.cpu_count()
+    if chunksize is None:
+        chunksize = max(1, len(seeds) // (workers * 4))
+
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(partial(play, agent, max_pieces=max_pieces), seeds, chunksize)
+
+
+def parse_seeds(text):
+    if ":" in text:
+        start, stop = text.split(":")
+        return range(int(start), int(stop))
+    return [int(seed) for seed in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play headless games with an agent over many seeds.")
+    parser.add_argument("agent", nargs="?", default="tournament:random_agent",
+                        help="module:callable taking a Game and returning (x, orient)")
+    parser.add_argument("--seeds", default="0:100", type=parse_seeds, help="start:stop range or comma list")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--max-pieces", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    agent = load_agent(args.agent)
+    start, games, pieces = time.perf_counter(), 0, 0
+    for result in run(agent, args.seeds, args.workers, args.chunksize, args.max_pieces):
+        print(json.dumps(result), flush=True)
+        games, pieces = games + 1, pieces + result["pieces"]
+
+    elapsed = time.perf_counter() - start
+    print(f"{games} games, {pieces} pieces in {elapsed:.2f}s ({pieces / elapsed:.0f} pieces/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()